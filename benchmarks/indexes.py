@@ -0,0 +1,162 @@
+"""Insert and lookup benchmark for the index cleanup migration (v0004).
+
+Builds two databases seeded with the same rows, one migrated up to v0003
+(the original index set) and one up to the latest version, and times
+single-row inserts and the lookups the routers run on both:
+
+    python benchmarks/indexes.py --heroes 50000 --teams 500
+
+Each side gets a fresh temporary SQLite file unless --url-before and
+--url-after point at two scratch databases, e.g. on Postgres; their
+cities, teams and heroes are dropped and recreated.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from database.migrations import upgrade  # noqa: E402
+
+ORIGINAL_VERSION = 3
+TABLES = ("heroes", "cities", "teams", "schema_version")
+
+
+def build(url: Optional[str], version: Optional[int], counts: dict[str, int]):
+    url = url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "indexes.sqlite")
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for table in TABLES:
+            connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    upgrade(engine, version)
+    rng = random.Random(0)
+    with engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO teams (name, headquaters) VALUES (:name, :hq)"),
+            [{"name": f"Team {i}", "hq": f"HQ {i}"} for i in range(counts["teams"])],
+        )
+        connection.execute(
+            text(
+                "INSERT INTO heroes (name, secret_name, age, team_id) "
+                "VALUES (:name, :secret, :age, :team)"
+            ),
+            [
+                {
+                    "name": f"Hero {i}",
+                    "secret": f"Secret {i}",
+                    "age": rng.randint(16, 90),
+                    "team": rng.randint(1, counts["teams"]),
+                }
+                for i in range(counts["heroes"])
+            ],
+        )
+        connection.execute(
+            text("INSERT INTO cities (name, capital_city) VALUES (:name, :capital)"),
+            [
+                {"name": f"City {i}", "capital": f"Capital {i}"}
+                for i in range(counts["cities"])
+            ],
+        )
+    return engine
+
+
+def per_call(run: Callable[[int], None], calls: int) -> float:
+    """Median microseconds per call over five rounds of ``calls`` calls."""
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for i in range(calls):
+            run(i)
+        samples.append((time.perf_counter() - start) / calls * 1e6)
+    return statistics.median(samples)
+
+
+def measure(engine, counts: dict[str, int], calls: int) -> dict[str, float]:
+    rng = random.Random(1)
+    results = {}
+    with engine.connect() as connection:
+        inserted = iter(range(10**9))
+
+        def insert_hero(i: int) -> None:
+            n = next(inserted)
+            with connection.begin():
+                connection.execute(
+                    text(
+                        "INSERT INTO heroes (name, secret_name, age, team_id) "
+                        "VALUES (:name, :secret, :age, :team)"
+                    ),
+                    {
+                        "name": f"New hero {n}",
+                        "secret": f"New secret {n}",
+                        "age": 30,
+                        "team": rng.randint(1, counts["teams"]),
+                    },
+                )
+
+        def query(sql: str, make_params: Callable[[], dict]) -> Callable[[int], None]:
+            statement = text(sql)
+            return lambda i: connection.execute(statement, make_params()).all()
+
+        results["insert hero"] = per_call(insert_hero, calls)
+        results["hero by id"] = per_call(
+            query(
+                "SELECT * FROM heroes WHERE id = :id",
+                lambda: {"id": rng.randint(1, counts["heroes"])},
+            ),
+            calls,
+        )
+        results["hero by name"] = per_call(
+            query(
+                "SELECT * FROM heroes WHERE name = :name",
+                lambda: {"name": f"Hero {rng.randrange(counts['heroes'])}"},
+            ),
+            calls,
+        )
+        results["heroes of team"] = per_call(
+            query(
+                "SELECT * FROM heroes WHERE team_id = :team",
+                lambda: {"team": rng.randint(1, counts["teams"])},
+            ),
+            calls,
+        )
+        results["city page"] = per_call(
+            query(
+                "SELECT * FROM cities WHERE id > :after ORDER BY id LIMIT 50",
+                lambda: {"after": rng.randrange(counts["cities"])},
+            ),
+            calls,
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--heroes", type=int, default=20000)
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--cities", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--url-before", help="Scratch database for the old indexes.")
+    parser.add_argument("--url-after", help="Scratch database for the new indexes.")
+    args = parser.parse_args()
+
+    counts = {"heroes": args.heroes, "teams": args.teams, "cities": args.cities}
+    before = measure(
+        build(args.url_before, ORIGINAL_VERSION, counts), counts, args.calls
+    )
+    after = measure(build(args.url_after, None, counts), counts, args.calls)
+    print(f"{'us per call':<16}{'v0003':>10}{'latest':>10}{'change':>9}")
+    for name in before:
+        change = after[name] / before[name] - 1
+        print(f"{name:<16}{before[name]:>10.1f}{after[name]:>10.1f}{change:>+9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Load test: seed a database, replay a request mix, report latency per endpoint.
+
+Seeds cities, teams and heroes (a throwaway SQLite file by default, or any
+database given with --url, whose three tables are emptied first), then
+replays a built-in request mix or captured traffic against the app, either
+in-process through ``main.create_app()`` or over HTTP against a uvicorn
+server. Throughput and p50/p95/p99 are reported per endpoint and router.
+
+    python benchmarks/loadtest.py --mix reads --requests 5000 --concurrency 32
+    python benchmarks/loadtest.py --mode server --mix mixed --duration 30
+    python benchmarks/loadtest.py --replay captured.jsonl
+
+Captured traffic is JSON lines of ``{"method", "path", "body"}``. Save a run
+with --save-baseline and check a later run against it with --compare; the
+comparison exits with status 1 when any endpoint or router got slower (p95)
+or lost throughput by more than --tolerance.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# (weight, method, path template, body template) per mix. Templates are
+# filled by RequestFactory; {n} is unique per request.
+MIXES = {
+    "reads": [
+        (30, "GET", "/cities/{city_id}", None),
+        (20, "GET", "/heroes/{hero_id}", None),
+        (10, "GET", "/teams/{team_id}", None),
+        (10, "GET", "/cities/?limit=50", None),
+        (5, "GET", "/heroes/?limit=50&include=team", None),
+        (5, "GET", "/teams/{team_id}/heroes", None),
+        (5, "GET", "/cities/?query={city_name}", None),
+        (5, "GET", "/heroes/batch?ids={hero_ids}", None),
+        (5, "GET", "/cities/search?q={city_prefix}", None),
+        (5, "GET", "/heroes/{hero_id}/teams?show_team=true", None),
+    ],
+    "mixed": [
+        (40, "GET", "/cities/{city_id}", None),
+        (20, "GET", "/heroes/{hero_id}", None),
+        (10, "GET", "/teams/?limit=50", None),
+        (10, "GET", "/heroes/?limit=50&include=team", None),
+        (8, "POST", "/cities/", {"name": "Load {n}", "capital_city": "Cap {n}"}),
+        (4, "POST", "/heroes/", {"name": "Hero {n}", "secret_name": "Secret {n}"}),
+        (4, "PATCH", "/cities/{city_id}/capital", {"capital_city": "Patched {n}"}),
+        (4, "PUT", "/teams/{team_id}", {"name": "Team {n}", "headquaters": "HQ {n}"}),
+    ],
+}
+
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class RequestFactory:
+    """Turns mix templates into concrete requests over the seeded rows."""
+
+    def __init__(self, counts: dict[str, int], seed: int):
+        self.counts = counts
+        self.random = random.Random(seed)
+        self.counter = itertools.count()
+
+    def values(self) -> dict[str, Any]:
+        pick = self.random.randint
+        city_id = pick(1, self.counts["cities"])
+        hero_ids = [pick(1, self.counts["heroes"]) for _ in range(10)]
+        return {
+            "n": f"{os.getpid()}-{next(self.counter)}",
+            "city_id": city_id,
+            "hero_id": hero_ids[0],
+            "team_id": pick(1, self.counts["teams"]),
+            "hero_ids": ",".join(map(str, hero_ids)),
+            "city_name": f"City {city_id}",
+            "city_prefix": f"City {str(city_id)[:2]}",
+        }
+
+    def build(self, entry: tuple) -> tuple[str, str, str, Optional[dict]]:
+        _, method, template, body = entry
+        values = self.values()
+        path = template.format(**values)
+        if body is not None:
+            body = {key: value.format(**values) for key, value in body.items()}
+        return f"{method} {template}", method, path, body
+
+    def from_mix(self, mix: list[tuple]):
+        weights = [entry[0] for entry in mix]
+        while True:
+            yield self.build(self.random.choices(mix, weights)[0])
+
+
+def from_capture(path: Path):
+    """Replay captured requests in order, forever."""
+    captured = []
+    for line in path.read_text().splitlines():
+        if line.strip():
+            record = json.loads(line)
+            method = record.get("method", "GET").upper()
+            target = record["path"]
+            endpoint = f"{method} {ID_SEGMENT.sub('/{id}', target.split('?')[0])}"
+            captured.append((endpoint, method, target, record.get("body")))
+    return itertools.cycle(captured)
+
+
+def seed_database(counts: dict[str, int]) -> None:
+    from sqlalchemy import delete, insert
+
+    from database import db
+    from models.city import City
+    from models.hero import Hero
+    from models.team import Team
+
+    db.init_engines()
+    db.create_tables()
+    with db.get_engine().begin() as connection:
+        for model in (Hero, Team, City):
+            connection.execute(delete(model))
+        connection.execute(
+            insert(City),
+            [
+                {"id": index, "name": f"City {index}", "capital_city": f"Cap {index}"}
+                for index in range(1, counts["cities"] + 1)
+            ],
+        )
+        connection.execute(
+            insert(Team),
+            [
+                {"id": index, "name": f"Team {index}", "headquaters": f"HQ {index}"}
+                for index in range(1, counts["teams"] + 1)
+            ],
+        )
+        connection.execute(
+            insert(Hero),
+            [
+                {
+                    "id": index,
+                    "name": f"Hero {index}",
+                    "secret_name": f"Secret {index}",
+                    "age": 20 + index % 50,
+                    "team_id": 1 + index % counts["teams"],
+                }
+                for index in range(1, counts["heroes"] + 1)
+            ],
+        )
+    asyncio.run(db.dispose_engines())
+
+
+async def replay(
+    client, requests, total: Optional[int], duration: Optional[float], concurrency: int
+) -> tuple[dict[str, list[float]], dict[str, int], float]:
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    deadline = time.perf_counter() + duration if duration else None
+    remaining = itertools.count() if total is None else iter(range(total))
+
+    async def worker() -> None:
+        for _ in remaining:
+            if deadline is not None and time.perf_counter() > deadline:
+                return
+            endpoint, method, path, body = next(requests)
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors[endpoint] = errors.get(endpoint, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(
+    latencies: dict[str, list[float]], errors: dict[str, int], elapsed: float
+) -> dict[str, dict]:
+    """Stats per endpoint, per router (``router /cities``) and in total."""
+    groups: dict[str, list[float]] = {}
+    group_errors: dict[str, int] = {}
+    for endpoint, samples in latencies.items():
+        router = "router /" + endpoint.split(" ", 1)[1].strip("/").split("/")[0]
+        for name in (endpoint, router, "total"):
+            groups.setdefault(name, []).extend(samples)
+            group_errors[name] = group_errors.get(name, 0) + errors.get(endpoint, 0)
+    return {
+        name: {
+            "requests": len(samples),
+            "errors": group_errors[name],
+            "throughput": len(samples) / elapsed,
+            "mean_ms": statistics.fmean(samples) * 1000,
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+        }
+        for name, samples in sorted(groups.items())
+    }
+
+
+def print_report(report: dict[str, dict]) -> None:
+    print(
+        f"{'endpoint':<48} {'reqs':>7} {'err':>5} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8}"
+    )
+    for name, stats in report.items():
+        print(
+            f"{name:<48} {stats['requests']:>7} {stats['errors']:>5}"
+            f" {stats['throughput']:>9.1f} {stats['p50_ms']:>8.2f}"
+            f" {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}"
+        )
+
+
+def compare(
+    report: dict[str, dict],
+    baseline: dict[str, dict],
+    tolerance: float,
+    min_requests: int,
+) -> list[str]:
+    regressions = []
+    for name, base in baseline.items():
+        current = report.get(name)
+        # Percentiles of a handful of samples are mostly noise.
+        if current is None or base["requests"] < min_requests:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {base['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms"
+            )
+        if current["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {base['throughput']:.1f} -> {current['throughput']:.1f} req/s"
+            )
+    return regressions
+
+
+async def run_in_process(args, requests) -> tuple:
+    import httpx
+
+    from main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        # Count unhandled errors as the 500s a server would answer with.
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest"
+        ) as client:
+            return await replay(
+                client, requests, args.requests, args.duration, args.concurrency
+            )
+
+
+async def run_against_server(args, requests) -> tuple:
+    import httpx
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/metrics")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise SystemExit("Server did not start.")
+            return await replay(
+                client, requests, args.requests, args.duration, args.concurrency
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url", help="Database URL, a temporary SQLite file by default."
+    )
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--heroes", type=int, default=5000)
+    parser.add_argument("--no-seed", action="store_true", help="Use the data as it is.")
+    parser.add_argument("--mode", choices=("inprocess", "server"), default="inprocess")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="reads")
+    parser.add_argument(
+        "--replay", type=Path, help="Captured traffic to replay instead."
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--duration", type=float, help="Seconds to run, instead of --requests."
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the mix.")
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--compare", type=Path, help="Baseline to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--min-requests",
+        type=int,
+        default=100,
+        help="Only compare endpoints with at least this many baseline requests.",
+    )
+    args = parser.parse_args()
+    if args.duration:
+        args.requests = None
+
+    # Settings are read on import, so the environment goes first.
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "loadtest.sqlite")
+    os.environ["PSQL_URL"] = url
+    os.environ.pop("PSQL_ASYNC_URL", None)
+    counts = {"cities": args.cities, "teams": args.teams, "heroes": args.heroes}
+    if not args.no_seed:
+        seed_database(counts)
+
+    if args.replay:
+        requests = from_capture(args.replay)
+    else:
+        requests = RequestFactory(counts, args.seed).from_mix(MIXES[args.mix])
+    runner = run_against_server if args.mode == "server" else run_in_process
+    latencies, errors, elapsed = asyncio.run(runner(args, requests))
+
+    report = summarize(latencies, errors, elapsed)
+    print(
+        f"mode: {args.mode}  mix: {args.replay or args.mix}  concurrency: {args.concurrency}  elapsed: {elapsed:.2f} s"
+    )
+    print_report(report)
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        regressions = compare(report, baseline, args.tolerance, args.min_requests)
+        if regressions:
+            print("Regressions:")
+            print("\n".join(f"  {line}" for line in regressions))
+            raise SystemExit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
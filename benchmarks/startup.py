@@ -0,0 +1,75 @@
+"""Cold start benchmark.
+
+Starts fresh interpreters and times ``import main`` (no database access
+since engines moved into the lifespan) and the lifespan startup, with and
+without create_all on startup. The baseline runs replay what importing
+database.db used to do, creating the engines and calling create_tables(),
+as part of the import. Run from the repository root, the database in .env
+must be reachable:
+
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+if sys.argv[1:] == ["baseline"]:
+    from database import db
+    db.init_engines()
+    db.create_tables()
+imported = time.perf_counter()
+
+async def startup():
+    async with main.lifespan(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({"import": imported - start, "ready": ready - start}))
+"""
+
+
+def run_probe(create_tables: bool, baseline: bool = False) -> dict:
+    env = dict(os.environ, DB_CREATE_TABLES=str(create_tables).lower())
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, *(["baseline"] if baseline else [])],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    probes = (
+        ("baseline", False, True),
+        ("lifespan", False, False),
+        ("create_all", True, False),
+    )
+    # Interleaved, so drift on the machine affects every probe alike.
+    samples: dict[str, list[dict]] = {label: [] for label, _, _ in probes}
+    for _ in range(args.runs):
+        for label, create_tables, baseline in probes:
+            samples[label].append(run_probe(create_tables, baseline))
+    for label, runs in samples.items():
+        import_time = statistics.median(sample["import"] for sample in runs)
+        ready_time = statistics.median(sample["ready"] for sample in runs)
+        print(
+            f"{label:>10}: import {import_time * 1000:8.1f} ms"
+            f"  ready {ready_time * 1000:8.1f} ms  (median of {args.runs})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional, Sequence
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database.changes import ChangeEvent, subscribe, subscribe_outdated
+from database.repository import ReadRepository
+from database.settings import settings
+from database.singleflight import SingleFlight
+
+CACHE_MAX_SIZE = settings.cache_max_size
+CACHE_TTL = settings.cache_ttl
+
+MISSING = object()
+
+# Every ReadCache by table name, for diagnostics.
+caches: dict[str, "ReadCache"] = {}
+
+
+class LRUCache:
+    """Bounded LRU mapping whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = CACHE_MAX_SIZE, ttl: float = CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ReadCache:
+    """Read-through cache of one table's rows, keyed by id and unique columns.
+
+    Rows are stored as the plain dicts returned by ``repository`` under
+    ``("id", id)`` and under ``(field, value)`` for every field in
+    ``secondary``. Writers invalidate a row with its old and new values so
+    every key that could point at a stale copy is dropped. Each invalidation
+    bumps ``generation``; readers only store what they fetched if no
+    invalidation happened in the meantime.
+
+    Concurrent misses for the same key, and concurrent requests for the same
+    page, share one query through ``flights``. The generation is part of the
+    flight key, so a read starting after a write never joins a query that
+    started before it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        repository: ReadRepository,
+        secondary: Iterable[str] = ("name",),
+        maxsize: int = CACHE_MAX_SIZE,
+        ttl: float = CACHE_TTL,
+    ):
+        self.name = name
+        self.repository = repository
+        self.secondary = tuple(secondary)
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+        self.flights = SingleFlight(name)
+        caches[name] = self
+        subscribe(name, self.on_change)
+        subscribe_outdated(name, self.on_outdated)
+
+    def on_change(self, event: ChangeEvent) -> None:
+        self.invalidate(event.row, *([event.old] if event.old else []))
+
+    def on_outdated(self, table: str) -> None:
+        # Another worker wrote the table; which rows changed is unknown.
+        self.clear()
+
+    def keys_for(self, row: Any) -> set[tuple[str, Any]]:
+        values = row if isinstance(row, dict) else row.dict()
+        keys = {("id", values.get("id"))}
+        keys.update((field, values.get(field)) for field in self.secondary)
+        return keys
+
+    def store(self, row: Optional[dict], generation: int) -> Optional[dict]:
+        if row is not None and generation == self.generation:
+            for key in self.keys_for(row):
+                self.cache.set(key, row)
+        return row
+
+    def invalidate(self, *rows: Any, keys: Iterable[tuple[str, Any]] = ()) -> None:
+        self.generation += 1
+        for key in set(keys).union(*(self.keys_for(row) for row in rows)):
+            self.cache.delete(key)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.cache.clear()
+
+    async def get(self, session: AsyncSession, row_id: int) -> Optional[dict]:
+        value = self.cache.get(("id", row_id))
+        if value is not MISSING:
+            return value
+        generation = self.generation
+
+        async def load() -> Optional[dict]:
+            return self.store(await self.repository.get(session, row_id), generation)
+
+        return await self.flights.do(("id", row_id, generation), load)
+
+    async def get_many(
+        self, session: AsyncSession, row_ids: Iterable[int]
+    ) -> dict[int, dict]:
+        """Cached rows plus one IN query for the ids that were not cached."""
+        found = {}
+        missing = []
+        for row_id in set(row_ids):
+            value = self.cache.get(("id", row_id))
+            if value is MISSING:
+                missing.append(row_id)
+            elif value is not None:
+                found[row_id] = value
+        if missing:
+            generation = self.generation
+            rows = await self.repository.get_many(session, missing)
+            for row_id, row in rows.items():
+                found[row_id] = self.store(row, generation)
+        return found
+
+    async def get_by(
+        self, session: AsyncSession, field: str, value: Any
+    ) -> Optional[dict]:
+        cached = self.cache.get((field, value))
+        if cached is not MISSING:
+            return cached
+        generation = self.generation
+
+        async def load() -> Optional[dict]:
+            row = await self.repository.get_by(session, field, value)
+            return self.store(row, generation)
+
+        return await self.flights.do((field, value, generation), load)
+
+    async def fetch_page(
+        self,
+        session: AsyncSession,
+        limit: int,
+        after_id: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[dict]:
+        """Pages are not cached, only concurrent identical reads are shared."""
+        projection = tuple(fields) if fields is not None else None
+        key = ("page", limit, after_id, offset or None, projection, self.generation)
+        return await self.flights.do(
+            key,
+            lambda: self.repository.fetch_page(
+                session, limit, after_id, offset, fields
+            ),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "generation": self.generation,
+            **self.cache.stats(),
+            "singleflight": self.flights.stats(),
+        }
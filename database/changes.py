@@ -0,0 +1,48 @@
+from collections import defaultdict
+from typing import Callable, NamedTuple, Optional
+
+
+class ChangeEvent(NamedTuple):
+    table: str
+    # "insert", "update" or "delete"; the feed adds "reset" for tables
+    # written by other workers.
+    op: str
+    row: dict
+    # Row values before an update, when the writer knows them.
+    old: Optional[dict] = None
+
+
+Listener = Callable[[ChangeEvent], None]
+OutdatedListener = Callable[[str], None]
+
+listeners: dict[str, list[Listener]] = defaultdict(list)
+outdated_listeners: dict[str, list[OutdatedListener]] = defaultdict(list)
+
+
+def subscribe(table: str, listener: Listener) -> None:
+    """Call ``listener`` with every committed change to ``table``."""
+    listeners[table].append(listener)
+
+
+def publish_change(
+    table: str, op: str, row: dict, old: Optional[dict] = None
+) -> ChangeEvent:
+    """Announce a committed write. Write handlers call this after commit."""
+    event = ChangeEvent(table, op, row, old)
+    for listener in listeners[table]:
+        listener(event)
+    return event
+
+
+def subscribe_outdated(table: str, listener: OutdatedListener) -> None:
+    """Call ``listener`` when another worker is found to have written ``table``.
+
+    Those writes come without change events, so anything kept current from
+    events has to be dropped or reloaded.
+    """
+    outdated_listeners[table].append(listener)
+
+
+def publish_outdated(table: str) -> None:
+    for listener in outdated_listeners[table]:
+        listener(table)
@@ -0,0 +1,169 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database.db import session_scope
+from database.settings import settings
+
+# A single-row write: runs against a session, flushes, returns its result.
+# It may run twice (see WriteCoalescer.isolate), so it must build every
+# object it writes itself.
+WriteOp = Callable[[AsyncSession], Awaitable[Any]]
+
+
+def insert_op(model: Any, data: SQLModel) -> WriteOp:
+    async def insert(session: AsyncSession) -> Any:
+        row = model.from_orm(data)
+        session.add(row)
+        await session.flush()
+        return row
+
+    return insert
+
+
+def update_op(model: Any, row_id: int, values: dict) -> WriteOp:
+    """Set ``values`` on a row; returns ``(row, old_values)`` or None if missing."""
+
+    async def update(session: AsyncSession) -> Optional[tuple[Any, dict]]:
+        row = await session.get(model, row_id)
+        if row is None:
+            return None
+        old_values = row.dict()
+        for key, value in values.items():
+            setattr(row, key, value)
+        session.add(row)
+        await session.flush()
+        return row, old_values
+
+    return update
+
+
+class WriteCoalescer:
+    """Group commit for concurrent single-row writes.
+
+    Writes submitted within ``window`` seconds of the first pending one, or
+    until ``max_batch`` are pending, run in one session and one commit, so a
+    burst of creates costs a single transaction. Every caller still gets
+    its own result or exception. If the database rejects the batch, it is
+    rolled back and every write is retried in its own transaction, like
+    bulk inserts do, so one bad row only fails its own request.
+    """
+
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self.pending: list[tuple[WriteOp, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.writes = 0
+        self.isolated = 0
+
+    async def submit(self, op: WriteOp) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((op, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.create_task(self.run_batch(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run_batch(self, batch: list[tuple[WriteOp, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.writes += len(batch)
+        async with session_scope() as session:
+            outcomes = []
+            try:
+                for op, future in batch:
+                    try:
+                        outcomes.append((future, await op(session), None))
+                    except DBAPIError:
+                        raise
+                    except Exception as exc:
+                        # Ops raise before writing anything, e.g. HTTPException.
+                        outcomes.append((future, None, exc))
+                await session.commit()
+            except DBAPIError:
+                await session.rollback()
+                await self.isolate(session, batch)
+                return
+            except BaseException as exc:
+                for _, future in batch:
+                    resolve(future, None, exc)
+                raise
+        for future, result, exc in outcomes:
+            resolve(future, result, exc)
+
+    async def isolate(
+        self, session: AsyncSession, batch: list[tuple[WriteOp, asyncio.Future]]
+    ) -> None:
+        for op, future in batch:
+            self.isolated += 1
+            try:
+                result = await op(session)
+                await session.commit()
+            except Exception as exc:
+                await session.rollback()
+                resolve(future, None, exc)
+            else:
+                # Detached now, or a later rollback expires the committed rows
+                # and their callers can no longer read them.
+                session.expunge_all()
+                resolve(future, result, None)
+
+    async def close(self) -> None:
+        """Commit what is pending and wait for running batches."""
+        self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "window": self.window,
+            "max_batch": self.max_batch,
+            "pending": len(self.pending),
+            "batches": self.batches,
+            "writes": self.writes,
+            "isolated": self.isolated,
+        }
+
+
+def resolve(future: asyncio.Future, result: Any, exc: Optional[BaseException]):
+    # The caller may have gone away, e.g. the client disconnected.
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+coalescer = (
+    WriteCoalescer(
+        settings.write_coalesce_window_ms / 1000, settings.write_coalesce_max_batch
+    )
+    if settings.write_coalescing
+    else None
+)
+
+
+async def run_write(session: AsyncSession, op: WriteOp) -> Any:
+    """Run ``op`` and commit it, grouped with concurrent writes when enabled."""
+    if coalescer is not None:
+        return await coalescer.submit(op)
+    result = await op(session)
+    await session.commit()
+    return result
@@ -1,11 +1,169 @@
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
 from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database.pool import PoolStats, timed_async_queue_pool, timed_queue_pool
+from database.settings import settings
+from database.table_versions import seed_versions, table_versions
 from models.city import City
 from models.hero import Hero
 from models.team import Team
-from dotenv import dotenv_values, load_dotenv
 
-config = dotenv_values(".env")
-engine = create_engine(config["PSQL_URL"], echo=True)
+# Async drivers matching the sync ones we ship with.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver counterpart."""
+    db_url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(db_url.drivername, db_url.drivername)
+    return str(db_url.set(drivername=drivername))
+
+
+def engine_options(url: str, is_async: bool, stats: PoolStats) -> dict:
+    """create_engine keyword arguments built from the settings."""
+    options: dict[str, Any] = {"echo": settings.db_echo}
+    if settings.db_isolation_level:
+        options["isolation_level"] = settings.db_isolation_level
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        # SQLite connections are bound to their creating thread by default,
+        # which breaks the threadpool used for sync sessions below.
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    options.update(
+        poolclass=timed_async_queue_pool(stats)
+        if is_async
+        else timed_queue_pool(stats),
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    timeout = settings.db_statement_timeout_ms
+    if backend == "postgresql" and timeout is not None:
+        if is_async:
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(timeout)}
+            }
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+# Sync drivers are opt-in: set USE_SYNC_DRIVER=true to keep running every
+# query through the blocking engine (off the event loop, in a threadpool).
+USE_SYNC_DRIVER = settings.use_sync_driver
+
+# Created by init_engines() when the app starts, not at import time.
+engine = None
+async_engine = None
+async_session_maker = None
+
+
+def init_engines() -> None:
+    global engine, async_engine, async_session_maker
+    if engine is not None:
+        return
+    engine = create_engine(
+        settings.psql_url, **engine_options(settings.psql_url, False, pool_stats)
+    )
+    if not USE_SYNC_DRIVER:
+        async_url = settings.psql_async_url or get_async_url(settings.psql_url)
+        async_engine = create_async_engine(
+            async_url, **engine_options(async_url, True, async_pool_stats)
+        )
+        async_session_maker = sessionmaker(
+            async_engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+
+async def dispose_engines() -> None:
+    global engine, async_engine, async_session_maker
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
+    engine = async_engine = async_session_maker = None
+
+
+def get_engine():
+    if engine is None:
+        raise RuntimeError("Database engines are not initialized, call init_engines()")
+    return engine
+
+
+def get_async_engine():
+    """The async engine, or None when running on the sync driver."""
+    get_engine()
+    return async_engine
+
+
+class SyncSessionAdapter:
+    """Awaitable facade over a sync Session.
+
+    Exposes the subset of the AsyncSession API used by the routers and runs
+    every blocking call in the threadpool, so sync drivers never stall the
+    event loop.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add(self, instance: Any) -> None:
+        self.session.add(instance)
+
+    def add_all(self, instances: Any) -> None:
+        self.session.add_all(instances)
+
+    def expunge_all(self) -> None:
+        self.session.expunge_all()
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.session.get, *args, **kwargs)
+
+    async def exec(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.session.exec, *args, **kwargs)
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.session.execute, *args, **kwargs)
+
+    async def delete(self, instance: Any) -> None:
+        await run_in_threadpool(self.session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.session.rollback)
+
+    async def refresh(self, *args: Any, **kwargs: Any) -> None:
+        await run_in_threadpool(self.session.refresh, *args, **kwargs)
+
+    async def run_sync(self, fn: Any, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.session.close)
 
 
 # Dependency
@@ -14,10 +172,28 @@ def get_session():
         yield session
 
 
-def create_tables():
-    City.metadata.create_all(engine)
-    Team.metadata.create_all(engine)
-    Hero.metadata.create_all(engine)
+# Dependency
+async def get_async_session():
+    if USE_SYNC_DRIVER:
+        adapter = SyncSessionAdapter(Session(engine, expire_on_commit=False))
+        try:
+            yield adapter
+        finally:
+            await adapter.close()
+        return
+    async with async_session_maker() as session:
+        yield session
+
 
+# Same session outside of request dependencies, e.g. in streaming responses
+# that outlive the handler.
+session_scope = asynccontextmanager(get_async_session)
 
-create_tables()
+
+def create_tables():
+    City.metadata.create_all(get_engine())
+    Team.metadata.create_all(get_engine())
+    Hero.metadata.create_all(get_engine())
+    with get_engine().begin() as connection:
+        table_versions.create(connection, checkfirst=True)
+        seed_versions(connection)
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import deque
+from typing import Iterable, NamedTuple, Optional
+
+from database.changes import ChangeEvent, subscribe, subscribe_outdated
+from database.settings import settings
+
+FEED_TABLES = ("cities", "heroes", "teams")
+
+
+class FeedEntry(NamedTuple):
+    seq: int
+    event: ChangeEvent
+
+
+class Subscription:
+    """One client of the feed, with its own bounded queue of entries.
+
+    A client too slow to keep up is cut off rather than buffered without
+    bound; it reconnects with its last cursor and resumes from the backlog.
+    """
+
+    def __init__(self, tables: frozenset[str], max_queue: int):
+        self.tables = tables
+        self.queue: asyncio.Queue[Optional[FeedEntry]] = asyncio.Queue(max_queue)
+        self.closed = False
+
+    def push(self, entry: FeedEntry) -> None:
+        if self.closed or entry.event.table not in self.tables:
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        # Make room so the end marker always fits.
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def next(self, timeout: float) -> Optional[FeedEntry]:
+        """The next entry; None once closed. Raises TimeoutError when idle."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class ChangeFeed:
+    """Sequenced stream of committed changes, kept in a bounded backlog.
+
+    Every change published for ``tables`` gets the next sequence number and
+    is pushed to live subscriptions. The last ``size`` entries are kept so a
+    client can resume after a reconnect. Cursors carry the feed's epoch,
+    which changes on restart, so a cursor from another feed or one older
+    than the backlog cannot be resumed and the client has to reload.
+
+    Writes made by other workers come without rows: when the version poller
+    finds a table outdated, a ``reset`` entry for that table is sequenced
+    like a change, telling its subscribers to reload it.
+    """
+
+    def __init__(self, tables: Iterable[str], size: int):
+        self.tables = frozenset(tables)
+        self.epoch = str(time.time_ns())
+        self.seq = 0
+        self.backlog: deque[FeedEntry] = deque(maxlen=size)
+        self.subscriptions: set[Subscription] = set()
+        for table in self.tables:
+            subscribe(table, self.on_change)
+            subscribe_outdated(table, self.on_outdated)
+
+    def on_outdated(self, table: str) -> None:
+        self.on_change(ChangeEvent(table, "reset", {}))
+
+    def on_change(self, event: ChangeEvent) -> None:
+        self.seq += 1
+        entry = FeedEntry(self.seq, event)
+        self.backlog.append(entry)
+        for subscription in list(self.subscriptions):
+            subscription.push(entry)
+
+    def cursor(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def parse_cursor(self, cursor: str) -> Optional[int]:
+        """The sequence in ``cursor``, or None if it is not from this feed."""
+        epoch, _, seq = cursor.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq: int, tables: frozenset[str]) -> Optional[list[FeedEntry]]:
+        """Entries after ``seq``, or None if some have left the backlog."""
+        if seq > self.seq:
+            return None
+        oldest = self.backlog[0].seq if self.backlog else self.seq + 1
+        if seq + 1 < oldest:
+            return None
+        return [
+            entry
+            for entry in self.backlog
+            if entry.seq > seq and entry.event.table in tables
+        ]
+
+    def subscribe(self, tables: frozenset[str], max_queue: int) -> Subscription:
+        subscription = Subscription(tables, max_queue)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+        subscription.close()
+
+    def close(self) -> None:
+        """End every open stream, e.g. on shutdown."""
+        for subscription in list(self.subscriptions):
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "backlog": len(self.backlog),
+            "subscribers": len(self.subscriptions),
+        }
+
+
+change_feed = ChangeFeed(FEED_TABLES, settings.change_feed_backlog)
@@ -0,0 +1,346 @@
+"""Index audit: declared indexes against the queries the routers run.
+
+Drives every router through a short scenario on a scratch SQLite database,
+records which columns each statement filters and orders by, and reports
+per table:
+
+* duplicate - an index with the same columns as the primary key or
+  another index, or a plain index covered by a longer one;
+* missing - columns queried, or referencing another table, with no
+  index starting with them;
+* unused - plain indexes no recorded query starts with, which only cost
+  writes.
+
+Usage::
+
+    python -m database.index_audit              # audit the models
+    python -m database.index_audit --live URL   # audit an existing database
+
+It exits with status 1 when it finds duplicate or missing indexes.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Any, Iterable, NamedTuple, Optional
+
+from sqlalchemy import Column, Table, create_engine, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.dml import Delete, Update
+from sqlalchemy.sql.selectable import Select
+
+
+class IndexInfo(NamedTuple):
+    name: str
+    columns: tuple[str, ...]
+    # "primary", "unique" or "index".
+    kind: str
+
+
+class Finding(NamedTuple):
+    table: str
+    problem: str
+    detail: str
+
+
+def declared_indexes(table: Table) -> list[IndexInfo]:
+    """Indexes SQLAlchemy creates for ``table``, the primary key included."""
+    indexes = []
+    if table.primary_key.columns:
+        columns = tuple(column.name for column in table.primary_key.columns)
+        indexes.append(
+            IndexInfo(table.primary_key.name or "primary key", columns, "primary")
+        )
+    for index in table.indexes:
+        columns = tuple(column.name for column in index.columns)
+        indexes.append(
+            IndexInfo(index.name, columns, "unique" if index.unique else "index")
+        )
+    for constraint in table.constraints:
+        if constraint.__visit_name__ == "unique_constraint":
+            columns = tuple(column.name for column in constraint.columns)
+            name = constraint.name or f"unique ({', '.join(columns)})"
+            indexes.append(IndexInfo(name, columns, "unique"))
+    return indexes
+
+
+def live_indexes(connection: Any, table: str) -> list[IndexInfo]:
+    """Indexes an existing database has for ``table``."""
+    inspector = inspect(connection)
+    indexes = []
+    primary = inspector.get_pk_constraint(table)
+    if primary["constrained_columns"]:
+        name = primary.get("name") or "primary key"
+        indexes.append(
+            IndexInfo(name, tuple(primary["constrained_columns"]), "primary")
+        )
+    for index in inspector.get_indexes(table):
+        if index.get("duplicates_constraint"):
+            # Postgres lists the index backing a unique constraint too.
+            continue
+        kind = "unique" if index["unique"] else "index"
+        indexes.append(IndexInfo(index["name"], tuple(index["column_names"]), kind))
+    for constraint in inspector.get_unique_constraints(table):
+        columns = tuple(constraint["column_names"])
+        indexes.append(IndexInfo(constraint["name"] or "unique", columns, "unique"))
+    return indexes
+
+
+def statement_columns(statement: Any) -> Iterable[tuple[str, tuple[str, ...]]]:
+    """Per table, the columns ``statement`` filters and orders by, in order."""
+    clauses = []
+    if isinstance(statement, (Select, Update, Delete)):
+        clauses.append(statement.whereclause)
+    if isinstance(statement, Select):
+        clauses.extend(statement._order_by_clauses)
+    columns: dict[str, list[str]] = defaultdict(list)
+    for clause in clauses:
+        if clause is None:
+            continue
+        for element in visitors.iterate(clause):
+            table = getattr(element, "table", None)
+            if isinstance(element, Column) and isinstance(table, Table):
+                if element.name not in columns[table.name]:
+                    columns[table.name].append(element.name)
+    return ((table, tuple(names)) for table, names in columns.items())
+
+
+class QueryRecorder:
+    """Counts the column patterns of every statement run by any engine."""
+
+    def __init__(self):
+        self.patterns: dict[str, dict[tuple[str, ...], int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+
+    def __enter__(self) -> "QueryRecorder":
+        event.listen(Engine, "before_execute", self.record)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        event.remove(Engine, "before_execute", self.record)
+
+    def record(self, connection, statement, *args) -> None:
+        for table, columns in statement_columns(statement):
+            self.patterns[table][columns] += 1
+
+
+async def run_scenario(app: Any) -> None:
+    """Exercise every router's reads and writes once."""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://audit"
+        ) as client:
+            team = (
+                await client.post(
+                    "/teams/", json={"name": "Audit team", "headquaters": "HQ"}
+                )
+            ).json()
+            hero = (
+                await client.post(
+                    "/heroes/",
+                    json={
+                        "name": "Audit hero",
+                        "secret_name": "Audit",
+                        "age": 30,
+                        "team_id": team["id"],
+                    },
+                )
+            ).json()
+            city = (
+                await client.post(
+                    "/cities/",
+                    json={"name": "Audit city", "capital_city": "Audit capital"},
+                )
+            ).json()
+            bulk = [{"name": "Audit team", "headquaters": "Elsewhere"}]
+            await client.post(
+                "/teams/bulk", params={"on_conflict": "update"}, json=bulk
+            )
+            for path, params in (
+                ("/cities/", {}),
+                ("/cities/", {"query": "Audit city"}),
+                ("/cities/", {"ids": str(city["id"])}),
+                (f"/cities/{city['id']}", {}),
+                ("/cities/search", {"q": "Aud"}),
+                ("/cities/export", {}),
+                ("/heroes/", {}),
+                ("/heroes/", {"include": "team"}),
+                ("/heroes/", {"ids": str(hero["id"]), "include": "team"}),
+                (f"/heroes/{hero['id']}", {}),
+                (f"/heroes/{hero['id']}/teams", {"show_team": "true"}),
+                ("/teams/", {}),
+                ("/teams/", {"ids": str(team["id"])}),
+                (f"/teams/{team['id']}", {}),
+                (f"/teams/{team['id']}/heroes", {}),
+            ):
+                await client.get(path, params=params)
+            await client.patch(
+                f"/cities/{city['id']}/name", json={"name": "Audit town"}
+            )
+            await client.patch(
+                f"/cities/{city['id']}/capital", json={"capital_city": "Audit seat"}
+            )
+            await client.put(
+                f"/teams/{team['id']}", json={"name": "Audit team", "headquaters": "HQ"}
+            )
+            await client.delete(f"/heroes/{hero['id']}")
+            await client.delete(f"/teams/{team['id']}")
+            await client.delete(f"/cities/{city['id']}")
+
+
+def record_patterns() -> tuple[dict, dict[str, Table]]:
+    """Run the scenario against a scratch database; patterns and model tables."""
+    # Settings are read on import, so the environment goes first.
+    path = os.path.join(tempfile.mkdtemp(), "audit.sqlite")
+    os.environ["PSQL_URL"] = "sqlite:///" + path
+    os.environ["DB_CREATE_TABLES"] = "true"
+    for name in ("PSQL_ASYNC_URL", "CITIES_SNAPSHOT", "ADMISSION_CONTROL"):
+        os.environ.pop(name, None)
+    from sqlmodel import SQLModel
+
+    import main
+
+    with QueryRecorder() as recorder:
+        asyncio.run(run_scenario(main.app))
+    return recorder.patterns, dict(SQLModel.metadata.tables)
+
+
+def audit_table(
+    name: str,
+    indexes: list[IndexInfo],
+    patterns: dict[tuple[str, ...], int],
+    foreign_keys: Iterable[str],
+) -> list[Finding]:
+    findings = []
+    rank = {"primary": 0, "unique": 1, "index": 2}
+    kept: dict[tuple[str, ...], IndexInfo] = {}
+    for index in sorted(indexes, key=lambda index: rank[index.kind]):
+        if index.columns in kept:
+            findings.append(
+                Finding(
+                    name,
+                    "duplicate",
+                    f"{index.name} {index.columns} repeats {kept[index.columns].name}",
+                )
+            )
+            continue
+        kept[index.columns] = index
+    for index in kept.values():
+        if index.kind != "index":
+            continue
+        longer = [
+            other
+            for other in kept.values()
+            if len(other.columns) > len(index.columns)
+            and other.columns[: len(index.columns)] == index.columns
+        ]
+        if longer:
+            findings.append(
+                Finding(
+                    name,
+                    "duplicate",
+                    f"{index.name} {index.columns} is covered by {longer[0].name}",
+                )
+            )
+
+    leading = {index.columns[0] for index in kept.values()}
+    queried = defaultdict(int)
+    for columns, count in patterns.items():
+        if columns and not leading.intersection(columns):
+            queried[columns] += count
+    for columns, count in sorted(queried.items()):
+        findings.append(
+            Finding(
+                name,
+                "missing",
+                f"{columns} filtered by {count} queries without an index",
+            )
+        )
+    for column in foreign_keys:
+        if column not in leading and not any(column in columns for columns in queried):
+            findings.append(
+                Finding(
+                    name,
+                    "missing",
+                    f"({column!r},) references another table without an index",
+                )
+            )
+
+    used = {column for columns in patterns for column in columns}
+    for index in kept.values():
+        if index.kind == "index" and index.columns[0] not in used:
+            findings.append(
+                Finding(
+                    name,
+                    "unused",
+                    f"{index.name} {index.columns} is not used by any router query",
+                )
+            )
+    return findings
+
+
+def audit(
+    tables: dict[str, Table],
+    patterns: dict,
+    connection: Optional[Any] = None,
+) -> list[Finding]:
+    findings = []
+    for name, table in sorted(tables.items()):
+        if connection is not None and not inspect(connection).has_table(name):
+            continue
+        indexes = (
+            live_indexes(connection, name)
+            if connection is not None
+            else declared_indexes(table)
+        )
+        foreign_keys = [key.parent.name for key in table.foreign_keys]
+        findings.extend(
+            audit_table(name, indexes, patterns.get(name, {}), foreign_keys)
+        )
+    return findings
+
+
+def print_report(findings: list[Finding], patterns: dict) -> None:
+    for table in sorted(patterns):
+        shapes = ", ".join(
+            f"{columns} x{count}" for columns, count in sorted(patterns[table].items())
+        )
+        print(f"{table}: {shapes}")
+    print()
+    if not findings:
+        print("No index problems found.")
+    for finding in findings:
+        print(f"{finding.table:>8}  {finding.problem:<9}  {finding.detail}")
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--live", metavar="URL", help="Audit the indexes of this database."
+    )
+    args = parser.parse_args(argv)
+
+    patterns, tables = record_patterns()
+    if args.live:
+        engine = create_engine(args.live)
+        try:
+            with engine.connect() as connection:
+                findings = audit(tables, patterns, connection)
+        finally:
+            engine.dispose()
+    else:
+        findings = audit(tables, patterns)
+    print_report(findings, patterns)
+    if any(finding.problem != "unused" for finding in findings):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,85 @@
+"""Minimal versioned schema migrations.
+
+Every module in database/versions named ``v<NNNN>_<name>.py`` exposes an
+``upgrade(connection)`` function. Applied versions are recorded in the
+``schema_version`` table and each migration runs in its own transaction.
+
+Usage::
+
+    python -m database.migrations upgrade   # apply pending migrations
+    python -m database.migrations current   # print the applied version
+"""
+import importlib
+import re
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select
+
+VERSIONS_DIR = Path(__file__).parent / "versions"
+VERSION_FILE = re.compile(r"^v(\d{4})_(\w+)\.py$")
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+)
+
+
+def discover() -> list[tuple[int, str]]:
+    migrations = []
+    for path in VERSIONS_DIR.iterdir():
+        match = VERSION_FILE.match(path.name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2)))
+    return sorted(migrations)
+
+
+def current_version(connection: Any) -> int:
+    version_metadata.create_all(connection, checkfirst=True)
+    version = connection.execute(select(func.max(schema_version.c.version)))
+    return version.scalar() or 0
+
+
+def upgrade(engine: Any, target: Optional[int] = None) -> list[int]:
+    """Apply pending migrations up to ``target`` and return their versions."""
+    with engine.begin() as connection:
+        current = current_version(connection)
+    applied = []
+    for version, name in discover():
+        if version <= current or (target is not None and version > target):
+            continue
+        module = importlib.import_module(f"database.versions.v{version:04d}_{name}")
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(
+                schema_version.insert().values(version=version, name=name)
+            )
+        applied.append(version)
+    return applied
+
+
+def main(argv: list[str]) -> None:
+    from database.db import get_engine, init_engines
+
+    command = argv[0] if argv else "upgrade"
+    init_engines()
+    try:
+        if command == "upgrade":
+            target = int(argv[1]) if len(argv) > 1 else None
+            applied = upgrade(get_engine(), target)
+            print(f"Applied migrations: {applied or 'none'}")
+        elif command == "current":
+            with get_engine().begin() as connection:
+                print(f"Schema version: {current_version(connection)}")
+        else:
+            raise SystemExit(f"Unknown command {command!r}, use upgrade or current.")
+    finally:
+        get_engine().dispose()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
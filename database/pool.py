@@ -0,0 +1,78 @@
+import time
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """How long checkouts waited for a connection and how often they gave up."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_total_seconds": self.wait_total,
+            "wait_max_seconds": self.wait_max,
+            "wait_avg_seconds": self.wait_total / self.checkouts
+            if self.checkouts
+            else 0.0,
+        }
+
+
+def timed_pool_class(base: Any, stats: PoolStats) -> Any:
+    """Subclass ``base`` (a QueuePool) so every checkout wait lands in ``stats``.
+
+    Stats live on the class so they survive the pool being recreated when the
+    engine is disposed.
+    """
+
+    class TimedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.record(time.perf_counter() - start)
+
+    TimedPool.stats = stats
+    return TimedPool
+
+
+def timed_queue_pool(stats: PoolStats) -> Any:
+    return timed_pool_class(QueuePool, stats)
+
+
+def timed_async_queue_pool(stats: PoolStats) -> Any:
+    return timed_pool_class(AsyncAdaptedQueuePool, stats)
+
+
+def pool_status(pool: Any, max_overflow: int) -> dict:
+    status = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(max_overflow, 0)
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            saturation=pool.checkedout() / capacity if capacity else 0.0,
+        )
+    stats = getattr(type(pool), "stats", None)
+    if stats is not None:
+        status.update(stats.as_dict())
+    return status
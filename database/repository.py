@@ -0,0 +1,98 @@
+from typing import Any, Iterable, Optional, Sequence, Type
+
+from sqlalchemy import bindparam, select
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+class ReadRepository:
+    """ORM-free reads of one table, returned as plain dicts.
+
+    Statements are built once per repository with bound parameters, so each
+    request only binds values and reuses the engine's compiled cache entry.
+    Rows never enter a session's identity map. Writes stay on the ORM.
+    ``fields`` narrows the statements to those columns of ``schema``.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        schema: Type[SQLModel],
+        fields: Optional[Sequence[str]] = None,
+    ):
+        self.model = model
+        self.schema = schema
+        self.table = model.__table__
+        self.fields = [
+            name
+            for name in schema.__fields__
+            if name in self.table.c and (fields is None or name in fields)
+        ]
+        self.columns = [self.table.c[name] for name in self.fields]
+        id_column = self.table.c.id
+        base = select(*self.columns)
+        self.by_id_stmt = base.where(id_column == bindparam("id"))
+        self.by_ids_stmt = base.where(id_column.in_(bindparam("ids", expanding=True)))
+        self.by_field_stmts = {
+            name: base.where(self.table.c[name] == bindparam("value")).limit(1)
+            for name in self.fields
+        }
+        page = base.order_by(id_column).limit(bindparam("limit"))
+        self.first_page_stmt = page
+        self.keyset_page_stmt = page.where(id_column > bindparam("after_id"))
+        self.offset_page_stmt = page.offset(bindparam("offset"))
+        self.projections: dict[tuple[str, ...], ReadRepository] = {}
+
+    def projection(self, fields: Sequence[str]) -> "ReadRepository":
+        """A repository selecting only ``fields``, built once per field set."""
+        key = tuple(name for name in self.fields if name in fields)
+        if key not in self.projections:
+            self.projections[key] = ReadRepository(self.model, self.schema, key)
+        return self.projections[key]
+
+    def to_dicts(self, result: Any) -> list[dict]:
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in result]
+
+    async def get(self, session: AsyncSession, row_id: int) -> Optional[dict]:
+        result = await session.execute(self.by_id_stmt, {"id": row_id})
+        rows = self.to_dicts(result)
+        return rows[0] if rows else None
+
+    async def get_many(
+        self, session: AsyncSession, row_ids: Iterable[int]
+    ) -> dict[int, dict]:
+        """Rows with any of ``row_ids`` by id, read with a single IN query."""
+        result = await session.execute(self.by_ids_stmt, {"ids": list(row_ids)})
+        return {row["id"]: row for row in self.to_dicts(result)}
+
+    async def get_by(
+        self, session: AsyncSession, field: str, value: Any
+    ) -> Optional[dict]:
+        result = await session.execute(self.by_field_stmts[field], {"value": value})
+        rows = self.to_dicts(result)
+        return rows[0] if rows else None
+
+    async def fetch_page(
+        self,
+        session: AsyncSession,
+        limit: int,
+        after_id: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[dict]:
+        """Up to ``limit`` rows in id order, after ``after_id`` or ``offset``.
+
+        With ``fields`` only those columns are selected.
+        """
+        if fields is not None:
+            repository = self.projection(fields)
+            return await repository.fetch_page(session, limit, after_id, offset)
+        if after_id is not None:
+            stmt, params = self.keyset_page_stmt, {"after_id": after_id}
+        elif offset:
+            stmt, params = self.offset_page_stmt, {"offset": offset}
+        else:
+            stmt, params = self.first_page_stmt, {}
+        result = await session.execute(stmt, {"limit": limit, **params})
+        return self.to_dicts(result)
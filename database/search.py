@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import re
+from collections import defaultdict
+from enum import Enum
+from typing import Optional, Sequence
+
+from sqlalchemy import case, func, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database.changes import ChangeEvent, subscribe, subscribe_outdated
+from database.db import get_engine, session_scope
+from database.repository import ReadRepository
+from database.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# pg_trgm's default similarity threshold.
+SIMILARITY_THRESHOLD = 0.3
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+INDEX_BATCH_SIZE = 1000
+
+WORD = re.compile(r"\w+")
+
+
+class SearchMode(str, Enum):
+    prefix = "prefix"
+    fuzzy = "fuzzy"
+
+
+def trigrams(value: str) -> set[str]:
+    """Trigrams of ``value`` the way pg_trgm builds them, word by word."""
+    grams = set()
+    for word in WORD.findall(value.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def prefix_trigrams(value: str) -> set[str]:
+    """Trigrams every value starting with ``value`` must contain."""
+    words = WORD.findall(value.lower())
+    if not words:
+        return set()
+    grams = trigrams(" ".join(words[:-1]))
+    padded = f"  {words[-1]}"
+    grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class NgramIndex:
+    """In-memory trigram index over some text columns of one table.
+
+    Postings map ``(field, trigram)`` to row ids. Prefix queries intersect
+    the postings of the query's trigrams and verify the candidates; fuzzy
+    queries count shared trigrams per candidate to get pg_trgm's similarity
+    without touching rows that share nothing with the query.
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+        self.rows: dict[int, dict] = {}
+        self.grams: dict[int, dict[str, set[str]]] = {}
+        self.postings: dict[tuple[str, str], set[int]] = defaultdict(set)
+
+    def add(self, row: dict) -> None:
+        self.remove(row["id"])
+        self.rows[row["id"]] = row
+        row_grams = self.grams[row["id"]] = {}
+        for field in self.fields:
+            row_grams[field] = trigrams(row[field] or "")
+            for gram in row_grams[field]:
+                self.postings[(field, gram)].add(row["id"])
+
+    def remove(self, row_id: int) -> None:
+        row_grams = self.grams.pop(row_id, None)
+        self.rows.pop(row_id, None)
+        if row_grams is None:
+            return
+        for field, grams in row_grams.items():
+            for gram in grams:
+                posting = self.postings.get((field, gram))
+                if posting is not None:
+                    posting.discard(row_id)
+                    if not posting:
+                        del self.postings[(field, gram)]
+
+    def search(self, query: str, mode: SearchMode, limit: int) -> list[dict]:
+        needle = query.lower().strip()
+        scored: dict[int, tuple[int, float]] = {}
+        prefix_grams = prefix_trigrams(needle)
+        for field in self.fields:
+            for row_id in self.intersect(field, prefix_grams):
+                value = (self.rows[row_id][field] or "").lower()
+                if value.startswith(needle):
+                    # Shorter completions of the prefix rank higher.
+                    rank = (1, len(needle) / max(len(value), 1))
+                    scored[row_id] = max(scored.get(row_id, rank), rank)
+
+        if mode == SearchMode.fuzzy:
+            query_grams = trigrams(needle)
+            for field in self.fields:
+                shared: dict[int, int] = defaultdict(int)
+                for gram in query_grams:
+                    for row_id in self.postings.get((field, gram), ()):
+                        shared[row_id] += 1
+                for row_id, common in shared.items():
+                    row_grams = self.grams[row_id][field]
+                    score = common / (len(query_grams) + len(row_grams) - common)
+                    if score >= SIMILARITY_THRESHOLD:
+                        rank = (0, score)
+                        scored[row_id] = max(scored.get(row_id, rank), rank)
+
+        ranked = sorted(
+            scored.items(), key=lambda item: (-item[1][0], -item[1][1], item[0])
+        )
+        return [self.rows[row_id] for row_id, _ in ranked[:limit]]
+
+    def intersect(self, field: str, grams: set[str]) -> set[int]:
+        if not grams:
+            return set()
+        postings = sorted(
+            (self.postings.get((field, gram), set()) for gram in grams), key=len
+        )
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+
+class TableSearch:
+    """Ranked prefix and fuzzy search over text columns of one table.
+
+    On Postgres queries run in SQL against pg_trgm GIN indexes (see the
+    v0002 migration). Other databases use an NgramIndex built on the first
+    search and kept current by the table's change events. When the version
+    poller finds the table written by another worker, the index is rebuilt
+    in the background while searches keep using the old one.
+    """
+
+    def __init__(self, repository: ReadRepository, fields: Sequence[str]):
+        self.repository = repository
+        self.fields = tuple(fields)
+        self.index: Optional[NgramIndex] = None
+        self.stale = False
+        # Changes published while a build reads the table, replayed onto it.
+        self.changes: Optional[list[ChangeEvent]] = None
+        self.builds = SingleFlight(f"{repository.table.name}_search")
+        self.rebuilding: Optional[asyncio.Task] = None
+        subscribe(repository.table.name, self.on_change)
+        subscribe_outdated(repository.table.name, self.on_outdated)
+
+    def on_change(self, event: ChangeEvent) -> None:
+        if self.changes is not None:
+            self.changes.append(event)
+        if self.index is not None:
+            self.apply(self.index, event)
+
+    def on_outdated(self, table: str) -> None:
+        self.stale = True
+
+    def apply(self, index: NgramIndex, event: ChangeEvent) -> None:
+        if event.op == "delete":
+            index.remove(event.row["id"])
+        else:
+            row = {field: event.row.get(field) for field in self.repository.fields}
+            index.add(row)
+
+    async def search(
+        self, session: AsyncSession, query: str, mode: SearchMode, limit: int
+    ) -> list[dict]:
+        if get_engine().dialect.name == "postgresql":
+            return await self.search_sql(session, query, mode, limit)
+        if self.index is None:
+            await self.builds.do("index", lambda: self.build(session))
+        elif self.stale and self.rebuilding is None:
+            self.rebuilding = asyncio.create_task(self.rebuild())
+        return self.index.search(query, mode, limit)
+
+    async def rebuild(self) -> None:
+        try:
+            async with session_scope() as session:
+                await self.builds.do("index", lambda: self.build(session))
+        except Exception:
+            logger.exception("Rebuilding the %s search index failed", self.builds.name)
+        finally:
+            self.rebuilding = None
+
+    async def build(self, session: AsyncSession) -> None:
+        # Cleared first, so a write found while reading triggers another build.
+        self.stale = False
+        self.changes = []
+        try:
+            index = NgramIndex(self.fields)
+            last_id = None
+            while True:
+                rows = await self.repository.fetch_page(
+                    session, INDEX_BATCH_SIZE, last_id
+                )
+                for row in rows:
+                    index.add(row)
+                if len(rows) < INDEX_BATCH_SIZE:
+                    break
+                last_id = rows[-1]["id"]
+            for event in self.changes:
+                self.apply(index, event)
+        except BaseException:
+            self.stale = True
+            raise
+        finally:
+            self.changes = None
+        self.index = index
+
+    async def search_sql(
+        self, session: AsyncSession, query: str, mode: SearchMode, limit: int
+    ) -> list[dict]:
+        table = self.repository.table
+        columns = [table.c[field] for field in self.fields]
+        pattern = escape_like(query.strip()) + "%"
+        matches = [column.ilike(pattern) for column in columns]
+        is_prefix = or_(*matches)
+        stmt = select(*self.repository.columns)
+        # Prefix matches rank by the length of the values that matched, as
+        # in NgramIndex; least() skips the NULLs of the other columns.
+        shortest = func.least(
+            *[
+                case((match, func.length(column)))
+                for match, column in zip(matches, columns)
+            ]
+        )
+        if mode == SearchMode.prefix:
+            stmt = stmt.where(is_prefix).order_by(shortest, table.c.id)
+        else:
+            similarity = func.greatest(
+                *[func.similarity(column, query) for column in columns]
+            )
+            is_similar = [column.op("%")(query) for column in columns]
+            # Rows that are no prefix match have no shortest and sort last.
+            stmt = stmt.where(or_(is_prefix, *is_similar)).order_by(
+                shortest, similarity.desc(), table.c.id
+            )
+        result = await session.execute(stmt.limit(limit))
+        return self.repository.to_dicts(result)
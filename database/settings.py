@@ -0,0 +1,63 @@
+from typing import Optional
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Process settings, read from the environment or the .env file."""
+
+    psql_url: str
+    # Defaults to psql_url with its driver swapped for an async one.
+    psql_async_url: Optional[str] = None
+    use_sync_driver: bool = False
+
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    db_statement_timeout_ms: Optional[int] = None
+    db_isolation_level: Optional[str] = None
+    # create_all on startup, for local development. Production databases
+    # are set up with `python -m database.migrations upgrade`.
+    db_create_tables: bool = False
+
+    cache_max_size: int = 1024
+    cache_ttl: float = 60
+    # Serve every city read from an in-memory copy of the table.
+    cities_snapshot: bool = False
+    # How often workers look for tables written by other workers.
+    table_version_poll_interval: float = 5
+    # Group concurrent single-row creates and updates into one commit,
+    # holding each for at most the window.
+    write_coalescing: bool = False
+    write_coalesce_window_ms: float = 2
+    write_coalesce_max_batch: int = 50
+
+    # Limit concurrent requests per DB bound router, shedding the excess.
+    admission_control: bool = False
+    admission_max_concurrency: int = 10
+    # Per router overrides, e.g. ADMISSION_LIMITS='{"/cities": 20}'.
+    admission_limits: dict[str, int] = {}
+    admission_max_queue: int = 100
+    admission_queue_timeout: float = 2
+    admission_retry_after: int = 1
+
+    # Server-sent change feed: changes kept for resuming, per client queue.
+    change_feed_backlog: int = 1000
+    change_feed_queue: int = 100
+    change_feed_heartbeat: float = 15
+    change_feed_retry_ms: int = 3000
+
+    # Response compression, brotli when installed, otherwise gzip.
+    compression: bool = True
+    compression_minimum_size: int = 1000
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    class Config:
+        env_file = ".env"
+
+
+settings = Settings()
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from middleware.metrics import SINGLEFLIGHT_CALLS
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers asking for the same key.
+
+    The first caller for a key (the leader) runs the call; callers arriving
+    while it runs await the leader's result instead of running their own
+    query. If the leader is cancelled, e.g. because its client went away,
+    the callers waiting on it start over and one of them leads.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self.calls:
+            future = self.calls[key]
+            self.coalesced += 1
+            SINGLEFLIGHT_CALLS.inc(self.name, "coalesced")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; retrieve the exception so it is not logged.
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self.calls[key] = future
+        self.leaders += 1
+        SINGLEFLIGHT_CALLS.inc(self.name, "leader")
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self.calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
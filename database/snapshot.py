@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from bisect import bisect_right
+from typing import Any, Iterable, NamedTuple, Optional, Sequence
+
+from sqlalchemy import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database.changes import ChangeEvent, subscribe
+from database.db import session_scope
+from database.repository import ReadRepository
+from database.table_versions import refresh_versions, version_of
+
+logger = logging.getLogger(__name__)
+
+# Every TableSnapshot by table name, loaded at startup and kept fresh.
+snapshots: dict[str, "TableSnapshot"] = {}
+
+
+class SnapshotData(NamedTuple):
+    version: int
+    # Row values as tuples in field order, by id.
+    rows: dict[int, tuple]
+    ids: tuple[int, ...]
+    # Unique field -> value -> id.
+    keys: dict[str, dict[Any, int]]
+
+
+class TableSnapshot:
+    """Whole table held in memory, serving the ReadRepository read API.
+
+    Every change builds a new SnapshotData and swaps it in, so readers never
+    see a half applied write and nothing is ever mutated in place. Local
+    writes are applied from their change events; writes made by other
+    workers are picked up when ``watch_versions`` sees the table's version
+    move past the snapshot's and reloads it.
+
+    Read methods take a session only to stand in for ReadCache and
+    ReadRepository; they never use it, so no connection is checked out.
+    """
+
+    def __init__(self, repository: ReadRepository, keys: Sequence[str] = ("name",)):
+        self.repository = repository
+        self.table = repository.table
+        self.name = str(repository.table.name)
+        self.fields = repository.fields
+        self.id_index = self.fields.index("id")
+        self.key_indexes = {key: self.fields.index(key) for key in keys}
+        self.data: Optional[SnapshotData] = None
+        self.loads = 0
+        self.changes = 0
+        snapshots[self.name] = self
+        subscribe(self.name, self.on_change)
+
+    @property
+    def loaded(self) -> bool:
+        return self.data is not None
+
+    def is_stale(self) -> bool:
+        return self.data is None or version_of(self.name).version > self.data.version
+
+    def build(self, version: int, rows: Iterable[tuple]) -> SnapshotData:
+        by_id = {row[self.id_index]: row for row in rows}
+        keys = {
+            key: {row[index]: row_id for row_id, row in by_id.items()}
+            for key, index in self.key_indexes.items()
+        }
+        return SnapshotData(version, by_id, tuple(sorted(by_id)), keys)
+
+    async def load(self, session: AsyncSession) -> None:
+        # Read the version first: a write landing in between only makes the
+        # snapshot newer than its version, which costs one extra reload.
+        await refresh_versions(session)
+        version = version_of(self.name).version
+        result = await session.execute(select(*self.repository.columns))
+        self.data = self.build(version, [tuple(row) for row in result])
+        self.loads += 1
+
+    def on_change(self, event: ChangeEvent) -> None:
+        data = self.data
+        if data is None:
+            return
+        rows = dict(data.rows)
+        row_id = event.row["id"]
+        if event.op == "delete":
+            rows.pop(row_id, None)
+        else:
+            rows[row_id] = tuple(event.row.get(field) for field in self.fields)
+        # Only advance the version if no other worker's write was skipped.
+        known = version_of(self.name).version
+        version = known if known - data.version <= 1 else data.version
+        self.data = self.build(version, rows.values())
+        self.changes += 1
+
+    def to_dict(self, row: tuple) -> dict:
+        return dict(zip(self.fields, row))
+
+    async def get(self, session: Any, row_id: int) -> Optional[dict]:
+        row = self.data.rows.get(row_id)
+        return None if row is None else self.to_dict(row)
+
+    async def get_many(self, session: Any, row_ids: Iterable[int]) -> dict[int, dict]:
+        rows = self.data.rows
+        return {
+            row_id: self.to_dict(rows[row_id]) for row_id in row_ids if row_id in rows
+        }
+
+    async def get_by(self, session: Any, field: str, value: Any) -> Optional[dict]:
+        row_id = self.data.keys[field].get(value)
+        return None if row_id is None else self.to_dict(self.data.rows[row_id])
+
+    async def fetch_page(
+        self,
+        session: Any,
+        limit: int,
+        after_id: Optional[int] = None,
+        offset: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[dict]:
+        data = self.data
+        if after_id is not None:
+            start = bisect_right(data.ids, after_id)
+        else:
+            start = offset or 0
+        row_ids = data.ids[start : start + limit]
+        if fields is not None:
+            positions = [
+                (name, index)
+                for index, name in enumerate(self.fields)
+                if name in fields
+            ]
+            return [
+                {name: row[index] for name, index in positions}
+                for row in map(data.rows.__getitem__, row_ids)
+            ]
+        return [self.to_dict(data.rows[row_id]) for row_id in row_ids]
+
+    def stats(self) -> dict:
+        data = self.data
+        return {
+            "rows": len(data.rows) if data else 0,
+            "version": data.version if data else None,
+            "known_version": version_of(self.name).version,
+            "loads": self.loads,
+            "changes": self.changes,
+        }
+
+
+async def load_snapshots() -> None:
+    """Learn every table's version, then load the snapshots, at startup.
+
+    Without snapshots the versions are only needed for ETags, so a database
+    that is down or not migrated yet is logged and left to
+    ``watch_versions`` to retry instead of failing the startup.
+    """
+    try:
+        async with session_scope() as session:
+            await refresh_versions(session)
+            for snapshot in snapshots.values():
+                await snapshot.load(session)
+    except Exception:
+        if snapshots:
+            raise
+        logger.exception("Loading table versions failed, the watcher will retry")
+
+
+async def watch_versions(interval: float) -> None:
+    """Poll table versions and reload snapshots that other workers outdated."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_scope() as session:
+                await refresh_versions(session)
+                for snapshot in snapshots.values():
+                    if snapshot.is_stale():
+                        await snapshot.load(session)
+        except Exception:
+            logger.exception("Refreshing table versions failed")
@@ -0,0 +1,218 @@
+"""Per-table change versions, shared by every worker through the database.
+
+Each transaction that writes rows bumps the version of their tables once,
+just before it commits and in the same transaction, so a committed write
+and its version bump are never seen apart. Workers learn new versions from
+their own commits immediately and from other workers' commits with
+``refresh_versions``.
+"""
+import logging
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Any, Iterable, NamedTuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    event,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database.changes import publish_outdated
+from database.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# session.info keys: tables written in the transaction, versions to publish
+# on commit, and tables to bump after commit (see bump_after_commit).
+WRITTEN_KEY = "written_tables"
+PENDING_KEY = "table_versions"
+DEFERRED_KEY = "deferred_table_versions"
+
+VERSIONED_TABLES = ("cities", "heroes", "teams")
+VERSION_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+# Under these levels Postgres fails a transaction updating a version row
+# another writer bumped since it began.
+SNAPSHOT_ISOLATION = {"REPEATABLE READ", "SERIALIZABLE"}
+BUMP_ISOLATION = "READ COMMITTED"
+
+metadata = MetaData()
+table_versions = Table(
+    "table_versions",
+    metadata,
+    Column("table_name", String(50), primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class TableVersion(NamedTuple):
+    version: int
+    updated_at: datetime
+
+
+# Version of tables never written to.
+NEVER = TableVersion(0, datetime.min.replace(tzinfo=timezone.utc))
+
+# Newest version of each table this worker knows about.
+known_versions: dict[str, TableVersion] = {}
+
+
+def version_of(table: str) -> TableVersion:
+    return known_versions.get(table, NEVER)
+
+
+def observe(table: str, version: TableVersion) -> bool:
+    """Record ``version`` if it is newer; returns whether it was."""
+    if version.version > version_of(table).version:
+        known_versions[table] = version
+        return True
+    return False
+
+
+def seed_versions(connection: Any, tables: Iterable[str] = VERSIONED_TABLES) -> None:
+    """Insert version 0 rows, so bumps never race to create them."""
+    existing = set(connection.execute(select(table_versions.c.table_name)).scalars())
+    missing = [table for table in tables if table not in existing]
+    if missing:
+        now = datetime.now(timezone.utc)
+        connection.execute(
+            table_versions.insert(),
+            [
+                {"table_name": table, "version": 0, "updated_at": now}
+                for table in missing
+            ],
+        )
+
+
+def bump_versions(connection: Any, tables: Iterable[str]) -> dict[str, TableVersion]:
+    """Add one to the versions of ``tables`` with a single upsert."""
+    now = datetime.now(timezone.utc)
+    # A stable order keeps concurrent writers from deadlocking on the rows.
+    names = sorted(tables)
+    versions = table_versions.c
+    insert = VERSION_INSERTS.get(connection.dialect.name)
+    if insert is None:
+        # Other databases rely on the rows seeded by the migrations.
+        stmt = update(table_versions).where(versions.table_name.in_(names))
+        connection.execute(stmt.values(version=versions.version + 1, updated_at=now))
+    else:
+        stmt = insert(table_versions).values(
+            [{"table_name": name, "version": 1, "updated_at": now} for name in names]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[versions.table_name],
+            set_={"version": versions.version + 1, "updated_at": now},
+        )
+        if getattr(connection.dialect, "full_returning", False):
+            result = connection.execute(
+                stmt.returning(versions.table_name, versions.version)
+            )
+            return {name: TableVersion(version, now) for name, version in result}
+        connection.execute(stmt)
+    # Without RETURNING (SQLite) the database lock still keeps writers apart.
+    result = connection.execute(
+        select(versions.table_name, versions.version).where(
+            versions.table_name.in_(names)
+        )
+    )
+    return {name: TableVersion(version, now) for name, version in result}
+
+
+def mark_written(session: Session, tables: Iterable[str]) -> None:
+    """Note ``tables`` as written; their versions are bumped at commit."""
+    session.info.setdefault(WRITTEN_KEY, set()).update(tables)
+
+
+async def record_write(session: Any, table: str) -> None:
+    """mark_written for writes made with Core statements, which skip flush."""
+    await session.run_sync(mark_written, [table])
+
+
+def bump_after_commit(session: Session) -> bool:
+    bind = session.get_bind()
+    isolation = (settings.db_isolation_level or "").upper()
+    return bind.dialect.name == "postgresql" and isolation in SNAPSHOT_ISOLATION
+
+
+@event.listens_for(Session, "after_flush")
+def collect_flushed_tables(session: Session, flush_context: Any) -> None:
+    changed = chain(
+        session.new,
+        session.deleted,
+        (instance for instance in session.dirty if session.is_modified(instance)),
+    )
+    mark_written(session, {str(instance.__table__.name) for instance in changed})
+
+
+@event.listens_for(Session, "before_commit")
+def bump_written_tables(session: Session) -> None:
+    # Commit flushes what is still pending only after this hook, do it now
+    # so those writes are counted too.
+    session.flush()
+    tables = session.info.pop(WRITTEN_KEY, None)
+    if not tables:
+        return
+    if bump_after_commit(session):
+        session.info[DEFERRED_KEY] = tables
+        return
+    bumped = bump_versions(session.connection(), tables)
+    session.info.setdefault(PENDING_KEY, {}).update(bumped)
+
+
+@event.listens_for(Session, "after_commit")
+def publish_versions(session: Session) -> None:
+    deferred = session.info.pop(DEFERRED_KEY, None)
+    if deferred:
+        # A short READ COMMITTED transaction of its own cannot hit a
+        # serialization failure. A crash right after the data commit loses
+        # this bump, until the next write to the table.
+        try:
+            bind = session.get_bind()
+            options = {"isolation_level": BUMP_ISOLATION}
+            with bind.connect().execution_options(**options) as connection:
+                with connection.begin():
+                    bumped = bump_versions(connection, deferred)
+            session.info.setdefault(PENDING_KEY, {}).update(bumped)
+        except Exception:
+            logger.exception("Bumping versions of %s failed", sorted(deferred))
+    for table, version in session.info.pop(PENDING_KEY, {}).items():
+        # Jumping more than one version means another worker committed in
+        # between, and the poller will not see that version as new.
+        skipped = version.version > version_of(table).version + 1
+        if observe(table, version) and skipped:
+            publish_outdated(table)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def drop_versions(session: Session, previous_transaction: Any) -> None:
+    for key in (WRITTEN_KEY, PENDING_KEY, DEFERRED_KEY):
+        session.info.pop(key, None)
+
+
+async def refresh_versions(session: Any) -> dict[str, TableVersion]:
+    """Load every table's version from the database into known_versions.
+
+    A version newer than this worker knew comes from another worker's
+    commit. Its table is published as outdated in the same step that
+    records the version, before any response can carry the new ETag.
+    """
+    result = await session.execute(select(table_versions))
+    outdated = []
+    for table, version, updated_at in result:
+        if updated_at.tzinfo is None:
+            # SQLite hands timestamps back without their zone, they are UTC.
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        if observe(table, TableVersion(version, updated_at)):
+            outdated.append(table)
+    for table in outdated:
+        publish_outdated(table)
+    return known_versions
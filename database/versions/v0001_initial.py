@@ -0,0 +1,38 @@
+"""Initial schema: cities, teams and heroes as first shipped.
+
+Tables are frozen here rather than taken from the models, and created with
+checkfirst so databases bootstrapped by create_all are adopted as they are.
+"""
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+Table(
+    "cities",
+    metadata,
+    Column("name", String(50), nullable=False, unique=True, index=True),
+    Column("capital_city", String(50), nullable=False, unique=True, index=True),
+    Column("id", Integer, primary_key=True, index=True),
+)
+
+Table(
+    "teams",
+    metadata,
+    Column("name", String(50), nullable=False, unique=True, index=True),
+    Column("headquaters", String, nullable=False),
+    Column("id", Integer, primary_key=True, index=True),
+)
+
+Table(
+    "heroes",
+    metadata,
+    Column("name", String(50), nullable=False, unique=True, index=True),
+    Column("secret_name", String, nullable=False, index=True),
+    Column("age", Integer, index=True),
+    Column("id", Integer, primary_key=True, index=True),
+    Column("team_id", Integer, ForeignKey("teams.id")),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
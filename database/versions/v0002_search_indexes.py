@@ -0,0 +1,27 @@
+"""Trigram indexes backing prefix and fuzzy search on Postgres.
+
+GIN ``gin_trgm_ops`` indexes serve both ``ILIKE 'q%'`` and the ``%``
+similarity operator. Other databases search an in-memory index instead, so
+there is nothing to create for them.
+"""
+from sqlalchemy import text
+
+SEARCH_COLUMNS = {
+    "cities": ("name", "capital_city"),
+    "heroes": ("name", "secret_name"),
+    "teams": ("name",),
+}
+
+
+def upgrade(connection) -> None:
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for table, columns in SEARCH_COLUMNS.items():
+        for column in columns:
+            connection.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm "
+                    f"ON {table} USING gin ({column} gin_trgm_ops)"
+                )
+            )
@@ -0,0 +1,33 @@
+"""Per-table change versions, bumped by every write transaction.
+
+A version 0 row is seeded for each table, so the first writers to a table
+update a row rather than racing to insert it.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+
+metadata = MetaData()
+
+VERSIONED_TABLES = ("cities", "heroes", "teams")
+
+table_versions = Table(
+    "table_versions",
+    metadata,
+    Column("table_name", String(50), primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
+    existing = set(connection.execute(select(table_versions.c.table_name)).scalars())
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"table_name": table, "version": 0, "updated_at": now}
+        for table in VERSIONED_TABLES
+        if table not in existing
+    ]
+    if rows:
+        connection.execute(table_versions.insert(), rows)
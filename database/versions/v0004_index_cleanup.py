@@ -0,0 +1,46 @@
+"""Corrected index set, as reported by ``python -m database.index_audit``.
+
+Drops the ``ix_*_id`` indexes repeating the primary keys and the hero
+``secret_name`` and ``age`` indexes no query uses, all of which every
+write had to maintain, and any unique constraint repeating a unique index.
+Adds the missing index on ``heroes.team_id``, used to load the heroes of a
+team and checked by the foreign key when a team is deleted.
+"""
+from sqlalchemy import Column, Index, Integer, MetaData, Table, inspect, text
+
+REDUNDANT_INDEXES = {
+    "cities": ("ix_cities_id",),
+    "teams": ("ix_teams_id",),
+    "heroes": ("ix_heroes_id", "ix_heroes_secret_name", "ix_heroes_age"),
+}
+
+metadata = MetaData()
+
+heroes = Table("heroes", metadata, Column("team_id", Integer))
+team_index = Index("ix_heroes_team_id", heroes.c.team_id)
+
+
+def upgrade(connection) -> None:
+    inspector = inspect(connection)
+    for table, names in REDUNDANT_INDEXES.items():
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        for name in names:
+            if name in existing:
+                connection.execute(text(f"DROP INDEX {name}"))
+    if connection.dialect.name == "postgresql":
+        # SQLite cannot drop constraints, and create_all never made these.
+        for table in REDUNDANT_INDEXES:
+            unique_indexes = {
+                tuple(index["column_names"])
+                for index in inspector.get_indexes(table)
+                # Postgres also lists the index backing each constraint.
+                if index["unique"] and not index.get("duplicates_constraint")
+            }
+            for constraint in inspector.get_unique_constraints(table):
+                if tuple(constraint["column_names"]) in unique_indexes:
+                    connection.execute(
+                        text(
+                            f"ALTER TABLE {table} DROP CONSTRAINT {constraint['name']}"
+                        )
+                    )
+    team_index.create(connection, checkfirst=True)
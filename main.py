@@ -1,8 +1,35 @@
 # import uvicorn
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from routes import cities_routes, heroes_routes, teams_routes
+from database import db
+from database.coalescer import coalescer
+from database.feed import change_feed
+from database.snapshot import load_snapshots, watch_versions
+from database.settings import settings
+from middleware.admission import AdmissionControlMiddleware
+from middleware.compression import CompressionMiddleware
+from middleware.conditional import ConditionalGetMiddleware
+from middleware.metrics import MetricsMiddleware, instrument_engine
+from routes import (
+    changes_routes,
+    cities_routes,
+    diagnostics_routes,
+    heroes_routes,
+    metrics_routes,
+    teams_routes,
+)
+from routes.serialization import FastJSONResponse
 
+# Tables each router's responses are built from, for ETags.
+conditional_tables = {
+    "/cities": ("cities",),
+    "/teams": ("teams", "heroes"),
+    "/heroes": ("heroes", "teams"),
+}
 origins = ["http://127.0.0.1:5173", "localhost:5173", "http://localhost:5173"]
 
 
@@ -10,11 +37,57 @@ def setup_routes(route_app: FastAPI):
     route_app.include_router(cities_routes.router)
     route_app.include_router(teams_routes.router)
     route_app.include_router(heroes_routes.router)
+    route_app.include_router(changes_routes.router)
+    route_app.include_router(diagnostics_routes.router)
+    route_app.include_router(metrics_routes.router)
+
+
+@asynccontextmanager
+async def lifespan(app_instance: FastAPI):
+    db.init_engines()
+    instrument_engine(db.get_engine())
+    if db.get_async_engine() is not None:
+        instrument_engine(db.get_async_engine().sync_engine)
+    if settings.db_create_tables:
+        await run_in_threadpool(db.create_tables)
+    await load_snapshots()
+    interval = settings.table_version_poll_interval
+    watcher = asyncio.create_task(watch_versions(interval))
+    yield
+    watcher.cancel()
+    change_feed.close()
+    if coalescer is not None:
+        await coalescer.close()
+    await db.dispose_engines()
 
 
 def create_app() -> FastAPI:
-    app_instance = FastAPI()
+    app_instance = FastAPI(default_response_class=FastJSONResponse)
+    app_instance.router.lifespan_context = lifespan
     setup_routes(route_app=app_instance)
+    if settings.admission_control:
+        # Innermost, so 304s never wait for a slot.
+        app_instance.add_middleware(
+            AdmissionControlMiddleware,
+            limits={
+                prefix: settings.admission_limits.get(
+                    prefix, settings.admission_max_concurrency
+                )
+                for prefix in conditional_tables
+            },
+            max_queue=settings.admission_max_queue,
+            queue_timeout=settings.admission_queue_timeout,
+            retry_after=settings.admission_retry_after,
+        )
+    app_instance.add_middleware(ConditionalGetMiddleware, tables=conditional_tables)
+    if settings.compression:
+        app_instance.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_minimum_size,
+            gzip_level=settings.compression_gzip_level,
+            brotli_quality=settings.compression_brotli_quality,
+        )
+    app_instance.add_middleware(MetricsMiddleware, fastapi_app=app_instance)
     return app_instance
 
 
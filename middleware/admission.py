@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import re
+from typing import Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from middleware.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_REJECTIONS,
+    prefix_of,
+)
+
+# GET /heroes/1 or /heroes/1/teams: one row by primary key.
+BY_ID_PATH = re.compile(r"^/[^/]+/\d+(/[^/]+)?/?$")
+
+
+def request_priority(scope: Scope) -> int:
+    """0 for cheap reads of one row by id, 1 for lists, searches and writes."""
+    if scope["method"] == "GET" and BY_ID_PATH.match(scope["path"]):
+        return 0
+    return 1
+
+
+class Limiter:
+    """Concurrency limit with a bounded priority queue for one router.
+
+    A finishing request hands its slot straight to the best waiter (lowest
+    priority value, then oldest). When the queue is full, a new request
+    may only displace a waiter of lower priority, which is shed; otherwise
+    the new request is rejected.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.order = itertools.count()
+
+    async def acquire(self, priority: int, timeout: float) -> Optional[str]:
+        """Take a slot, or return why the request was rejected."""
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.update_gauges()
+            return None
+        if len(self.waiters) >= self.max_queue:
+            if not self.waiters:
+                # max_queue 0: shed at once, nobody to displace.
+                return "queue_full"
+            worst = max(self.waiters)
+            if worst[0] <= priority:
+                return "queue_full"
+            self.remove(worst)
+            worst[2].set_result(False)
+        entry = (priority, next(self.order), asyncio.get_running_loop().create_future())
+        heapq.heappush(self.waiters, entry)
+        self.update_gauges()
+        future = entry[2]
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if future.done() and future.result():
+                self.release()
+            else:
+                self.remove(entry)
+            raise
+        if not future.done():
+            self.remove(entry)
+            future.cancel()
+            return "timeout"
+        return None if future.result() else "shed"
+
+    def release(self) -> None:
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                # The slot moves to the waiter, active stays the same.
+                future.set_result(True)
+                self.update_gauges()
+                return
+        self.active -= 1
+        self.update_gauges()
+
+    def remove(self, entry: tuple) -> None:
+        if entry in self.waiters:
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+        self.update_gauges()
+
+    def update_gauges(self) -> None:
+        ADMISSION_QUEUE_DEPTH.set(self.name, value=len(self.waiters))
+        ADMISSION_IN_FLIGHT.set(self.name, value=self.active)
+
+
+class AdmissionControlMiddleware:
+    """Pure ASGI middleware limiting concurrent requests per router.
+
+    ``limits`` maps router prefixes to how many of their requests may run
+    at once; others wait in a queue of at most ``max_queue`` for up to
+    ``queue_timeout`` seconds. Rejected requests get a fast 503 with
+    Retry-After instead of piling up on the database pool.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: dict[str, int],
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+    ):
+        self.app = app
+        self.limiters = {
+            prefix: Limiter(prefix, limit, max_queue)
+            for prefix, limit in limits.items()
+        }
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        prefix = prefix_of(scope["path"])
+        limiter = self.limiters.get(prefix)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await limiter.acquire(request_priority(scope), self.queue_timeout)
+        if reason is not None:
+            ADMISSION_REJECTIONS.inc(prefix, reason)
+            response = JSONResponse(
+                {"detail": "Server is busy, retry later!"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -1,27 +1,162 @@
-from typing import Callable
+import asyncio
+from typing import Callable, Optional, Pattern
+
 from fastapi import FastAPI, APIRouter, Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.routing import Match
+from starlette.responses import Response, StreamingResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class RouterMiddlewareEntry:
+    """Dispatch table row: where a router lives and the middlewares it owns."""
+
+    def __init__(self, router: APIRouter):
+        self.router = router
+        self.prefixes = router_prefixes(router)
+        # Path regex and methods of every route, None when any method goes.
+        self.routes: list[tuple[Pattern[str], Optional[set[str]]]] = [
+            (route.path_regex, getattr(route, "methods", None) or None)
+            for route in router.routes
+            if hasattr(route, "path_regex")
+        ]
+        self.middlewares: list[Callable] = []
+
+    def matches(self, path: str, method: str) -> bool:
+        if not any(
+            path == prefix or path.startswith(prefix.rstrip("/") + "/")
+            for prefix in self.prefixes
+        ):
+            return False
+        # Under the prefix is not enough: 404s and 405s stay out, and a
+        # router without a prefix would otherwise own every path.
+        return any(
+            (methods is None or method in methods) and regex.match(path)
+            for regex, methods in self.routes
+        )
+
+
+def router_prefixes(router: APIRouter) -> list[str]:
+    """Static path prefixes that cover every route of ``router``."""
+    if router.prefix:
+        return [router.prefix]
+    prefixes = {route.path.split("{", 1)[0] for route in router.routes}
+    return sorted(prefixes, key=len, reverse=True)
+
+
+class RouterMiddlewareDispatcher:
+    """Pure ASGI middleware running router specific middlewares.
+
+    The router owning a request is looked up once from the precomputed
+    prefix table and confirmed against that router's compiled routes;
+    requests no registered router would serve are passed straight through
+    without any wrapping.
+    """
+
+    def __init__(self, app: ASGIApp, entries: list[RouterMiddlewareEntry]):
+        self.app = app
+        # Shared with the decorator, so routers registered later are seen too.
+        self.entries = entries
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        entry = self.lookup(scope["path"], scope["method"])
+        if entry is None:
+            await self.app(scope, receive, send)
+            return
+
+        tasks: list[asyncio.Task] = []
+        call_next = self.build_chain(scope, entry.middlewares, tasks)
+        try:
+            response = await call_next(Request(scope, receive))
+            await response(scope, receive, send)
+        finally:
+            # A middleware may drop the response it got from call_next.
+            for task in tasks:
+                task.cancel()
+
+    def lookup(self, path: str, method: str) -> Optional[RouterMiddlewareEntry]:
+        for entry in self.entries:
+            if entry.matches(path, method):
+                return entry
+        return None
+
+    def build_chain(
+        self, scope: Scope, middlewares: list[Callable], tasks: list[asyncio.Task]
+    ) -> Callable:
+        async def call_app(request: Request) -> Response:
+            return await self.call_app(scope, request, tasks)
+
+        call_next = call_app
+        # Like app.add_middleware, the last registered middleware runs outermost.
+        for func in middlewares:
+            call_next = bind_middleware(func, call_next)
+        return call_next
+
+    async def call_app(
+        self, scope: Scope, request: Request, tasks: list[asyncio.Task]
+    ) -> Response:
+        """Run the wrapped app and hand its response back as it streams."""
+        queue: asyncio.Queue[Optional[Message]] = asyncio.Queue(maxsize=1)
+
+        async def run_app() -> None:
+            try:
+                await self.app(scope, request.receive, queue.put)
+            except asyncio.CancelledError:
+                raise
+            except BaseException:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        task = asyncio.create_task(run_app())
+        tasks.append(task)
+        message = await queue.get()
+        if message is None:
+            await task
+            raise RuntimeError("No response returned.")
+
+        async def body_stream():
+            try:
+                while True:
+                    body_message = await queue.get()
+                    if body_message is None:
+                        break
+                    if body_message["type"] == "http.response.body":
+                        yield body_message.get("body", b"")
+                await task
+            finally:
+                if not task.done():
+                    task.cancel()
+
+        response = StreamingResponse(body_stream(), status_code=message["status"])
+        response.raw_headers = list(message.get("headers", []))
+        return response
+
+
+def bind_middleware(func: Callable, call_next: Callable) -> Callable:
+    async def _middleware(request: Request) -> Response:
+        return await func(request, call_next)
+
+    return _middleware
 
 
 def router_middleware(app: FastAPI, router: APIRouter):
     """Decorator to add a router-specific middleware."""
 
     def deco(func: Callable) -> Callable:
-        async def _middleware(request: Request, call_next: Callable):
-            # Check if scopes match
-            matches = any(
-                [
-                    route.matches(request.scope)[0] == Match.FULL
-                    for route in router.routes
-                ]
-            )
-            if matches:  # Run the middleware if they do
-                return await func(request, call_next)
-            else:  # Otherwise skip the middleware
-                return await call_next(request)
-
-        app.add_middleware(BaseHTTPMiddleware, dispatch=_middleware)
+        entries = getattr(app.state, "router_middleware_entries", None)
+        if entries is None:
+            # A single dispatcher per app serves every router middleware.
+            entries = app.state.router_middleware_entries = []
+            app.add_middleware(RouterMiddlewareDispatcher, entries=entries)
+        entry = next((entry for entry in entries if entry.router is router), None)
+        if entry is None:
+            entry = RouterMiddlewareEntry(router)
+            entries.append(entry)
+            # Longest prefixes first, so nested routers win over their parents.
+            entries.sort(key=lambda item: -max(map(len, item.prefixes), default=0))
+        entry.middlewares.append(func)
         return func
 
     return deco
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database.table_versions import NEVER, TableVersion, version_of
+from middleware.metrics import prefix_of
+
+CONDITIONAL_METHODS = {"GET", "HEAD"}
+ONE_SECOND = timedelta(seconds=1)
+
+
+def build_etag(versions: Iterable[TableVersion]) -> str:
+    return 'W/"' + ".".join(str(version.version) for version in versions) + '"'
+
+
+def http_date(versions: Iterable[TableVersion]) -> Optional[str]:
+    latest = max(version.updated_at for version in versions)
+    if latest == NEVER.updated_at:
+        return None
+    # HTTP dates have whole seconds. Sent during the second of the last
+    # write, the date would not change for another write in that second.
+    if datetime.now(timezone.utc) < latest.replace(microsecond=0) + ONE_SECOND:
+        return None
+    return format_datetime(latest.astimezone(timezone.utc), usegmt=True)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 asks for If-None-Match.
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified_since(if_modified_since: str, last_modified: Optional[str]) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return parsedate_to_datetime(last_modified) <= since
+
+
+class ConditionalGetMiddleware:
+    """Pure ASGI middleware answering conditional GETs from table versions.
+
+    ``tables`` maps a router prefix to the tables its responses are built
+    from. The ETag and Last-Modified of a request come from the versions of
+    those tables this worker knows, taken before the handler runs, so a
+    matching If-None-Match (or If-Modified-Since) is answered with 304
+    without routing the request or touching the database. Writes made by
+    other workers are seen once the version poller picks them up.
+    """
+
+    def __init__(self, app: ASGIApp, tables: dict[str, tuple[str, ...]]):
+        self.app = app
+        self.tables = tables
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in CONDITIONAL_METHODS:
+            await self.app(scope, receive, send)
+            return
+        tables = self.tables.get(prefix_of(scope["path"]))
+        if tables is None:
+            await self.app(scope, receive, send)
+            return
+
+        versions = [version_of(table) for table in tables]
+        if NEVER in versions:
+            # Versions not loaded yet, e.g. the database was down at startup.
+            await self.app(scope, receive, send)
+            return
+        etag = build_etag(versions)
+        last_modified = http_date(versions)
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = etag_matches(if_none_match, etag)
+        else:
+            if_modified_since = request_headers.get("if-modified-since")
+            not_modified = if_modified_since is not None and not_modified_since(
+                if_modified_since, last_modified
+            )
+
+        validators = {"etag": etag, "cache-control": "no-cache"}
+        if last_modified is not None:
+            validators["last-modified"] = last_modified
+        if not_modified:
+            raw_headers = [
+                (name.encode(), value.encode()) for name, value in validators.items()
+            ]
+            await send(
+                {"type": "http.response.start", "status": 304, "headers": raw_headers}
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                for name, value in validators.items():
+                    if name not in headers:
+                        headers.append(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
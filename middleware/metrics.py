@@ -0,0 +1,260 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Optional, Sequence
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+def format_labels(labelnames: Sequence[str], labels: Sequence[str], **extra) -> str:
+    pairs = list(zip(labelnames, labels)) + list(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple, Any] = {}
+        registry.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}"]
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels: str, value: float) -> None:
+        state = self.values.get(labels)
+        if state is None:
+            # Per bucket counts (last one is +Inf), sum and count.
+            state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}"]
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                label_str = format_labels(self.labelnames, labels, le=bound)
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+registry: list[Metric] = []
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template and status.",
+    ("method", "route", "status"),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being served, by method and router prefix.",
+    ("method", "prefix"),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries issued per request.",
+    ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per request.",
+    ("method", "route"),
+)
+DB_QUERIES = Counter("db_queries_total", "Database queries executed.", ())
+DB_QUERY_TIME = Histogram(
+    "db_query_duration_seconds", "Duration of single database queries."
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Reads that ran their query (leader) or shared one in flight (coalesced).",
+    ("cache", "role"),
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Requests waiting for a slot, by router.", ("router",)
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests holding a slot, by router.", ("router",)
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests answered with 503 by admission control.",
+    ("router", "reason"),
+)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Stats of the request being served; engine events add to it.
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    DB_QUERIES.inc()
+    DB_QUERY_TIME.observe(value=elapsed)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time every query run through ``engine`` (a sync Engine)."""
+    if event.contains(engine, "before_cursor_execute", before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, in-flight and DB stats per route.
+
+    Routes are labelled by their template (``/cities/{city_id}``), resolved
+    from the endpoint the router stored in the scope, so label cardinality
+    stays bounded. Responses sent before routing, like conditional 304s and
+    admission 503s, are matched against the app's routes instead.
+    ``X-Process-Time`` is still set on every response.
+    """
+
+    def __init__(self, app: ASGIApp, fastapi_app: FastAPI):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self.templates: Optional[dict[Any, str]] = None
+        self.prefixes: Optional[set[str]] = None
+
+    def load_routes(self) -> None:
+        routes = self.fastapi_app.routes
+        self.templates = {route.endpoint: route.path for route in routes}
+        self.prefixes = {prefix_of(route.path) for route in routes}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.templates is None:
+            self.load_routes()
+
+        method = scope["method"]
+        prefix = prefix_of(scope["path"])
+        if prefix not in self.prefixes:
+            prefix = "other"
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Process-Time"] = str(time.perf_counter() - start_time)
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc(method, prefix)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            REQUESTS_IN_PROGRESS.dec(method, prefix)
+            current_request_stats.reset(token)
+            route = self.route_of(scope)
+            REQUEST_LATENCY.observe(method, route, str(status_code), value=elapsed)
+            REQUEST_DB_QUERIES.observe(method, route, value=stats.queries)
+            REQUEST_DB_TIME.observe(method, route, value=stats.db_time)
+
+    def route_of(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is not None:
+            return self.templates.get(endpoint, "unmatched")
+        for route in self.fastapi_app.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+
+def prefix_of(path: str) -> str:
+    return "/" + path.lstrip("/").split("/", 1)[0]
@@ -11,7 +11,7 @@ class CityBase(SQLModel):
 class City(CityBase, table=True):
     __tablename__: str = "cities"
 
-    id: Optional[int] = Field(default=None, primary_key=True, index=True)
+    id: Optional[int] = Field(default=None, primary_key=True)
 
 
 class CityRead(CityBase):
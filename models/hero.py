@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from sqlmodel import SQLModel, Field, Relationship
 
@@ -7,16 +7,16 @@ from models.team import Team, TeamRead
 
 class HeroBase(SQLModel):
     name: str = Field(max_length=50, unique=True, index=True)
-    secret_name: str = Field(index=True)
-    age: Optional[int] = Field(default=1, index=True)
+    secret_name: str
+    age: Optional[int] = Field(default=1)
 
 
 class Hero(HeroBase, table=True):
     __tablename__: str = "heroes"
 
-    id: Optional[int] = Field(default=None, primary_key=True, index=True)
+    id: Optional[int] = Field(default=None, primary_key=True)
     # Teams -> beacuse our table name of team model is Teams
-    team_id: Optional[int] = Field(default=None, foreign_key="teams.id")
+    team_id: Optional[int] = Field(default=None, foreign_key="teams.id", index=True)
     team: Optional[Team] = Relationship(back_populates="heroes")
 
 
@@ -30,3 +30,9 @@ class HeroCreate(HeroBase):
 
 class HeroReadWithTeams(HeroRead):
     team: Optional[TeamRead] = None
+
+
+# Lives here rather than in models/team.py, which cannot import HeroRead
+# without a circular import.
+class TeamWithHeroRead(TeamRead):
+    heroes: List[HeroRead] = []
@@ -0,0 +1,17 @@
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic.generics import GenericModel
+
+T = TypeVar("T")
+
+
+class Page(GenericModel, Generic[T]):
+    items: List[T]
+    # Opaque cursor for the next page, None on the last page.
+    next_cursor: Optional[str] = None
+
+
+class Batch(GenericModel, Generic[T]):
+    # One entry per requested id in request order, None where it was missing.
+    items: List[Optional[T]]
+    missing: List[int] = []
@@ -2,8 +2,6 @@ from typing import List, Optional
 
 from sqlmodel import Relationship, SQLModel, Field
 
-# from models.hero import Hero, HeroRead
-
 
 class TeamBase(SQLModel):
     name: str = Field(max_length=50, unique=True, index=True)
@@ -13,7 +11,7 @@ class TeamBase(SQLModel):
 class Team(TeamBase, table=True):
     __tablename__: str = "teams"
 
-    id: Optional[int] = Field(default=None, primary_key=True, index=True)
+    id: Optional[int] = Field(default=None, primary_key=True)
 
     heroes: List["Hero"] = Relationship(back_populates="team")
 
@@ -28,7 +26,3 @@ class TeamCreate(TeamBase):
 
 class TeamUpdate(TeamBase):
     pass
-
-
-# class TeamWithHeroRead(TeamRead):
-#     heroes: List[HeroRead] = []
@@ -0,0 +1,61 @@
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import HTTPException, Query, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from routes.serialization import FastJSONResponse
+
+MAX_BATCH_IDS = 100
+
+
+def batch_ids(
+    ids: str = Query(
+        description=f"Comma separated ids fetched in one go, at most {MAX_BATCH_IDS}.",
+    ),
+) -> list[int]:
+    """Parse ``?ids=1,2,3``, keeping the request order and duplicates."""
+    try:
+        row_ids = [int(row_id) for row_id in ids.split(",") if row_id.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be comma separated integers!",
+        )
+    if not row_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="ids must not be empty!"
+        )
+    if len(row_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_IDS} ids can be fetched at once!",
+        )
+    return row_ids
+
+
+async def fetch_many(
+    session: AsyncSession, model: Any, row_ids: Sequence[int], options: Sequence = ()
+) -> dict[int, Any]:
+    """ORM rows with any of ``row_ids`` by id, for reads that load relations."""
+    stmt = select(model).where(model.id.in_(set(row_ids))).options(*options)
+    return {row.id: row for row in (await session.exec(stmt)).all()}
+
+
+def batch_response(
+    row_ids: Sequence[int],
+    rows: dict[int, Any],
+    serialize: Optional[Callable[[Any], dict]] = None,
+) -> FastJSONResponse:
+    """Rows in request order, with None and an entry in ``missing`` for gaps."""
+    items = []
+    missing = []
+    for row_id in row_ids:
+        row = rows.get(row_id)
+        if row is None:
+            items.append(None)
+            if row_id not in missing:
+                missing.append(row_id)
+        else:
+            items.append(row if serialize is None else serialize(row))
+    return FastJSONResponse({"items": items, "missing": missing})
@@ -0,0 +1,228 @@
+import json
+from enum import Enum
+from typing import Any, Optional, Type
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database.changes import publish_change
+from database.db import get_engine
+from database.table_versions import record_write
+
+BULK_BATCH_SIZE = 500
+BULK_MAX_ROWS = 10_000
+
+# Dialect specific INSERT constructs, both support ON CONFLICT clauses.
+DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class ConflictMode(str, Enum):
+    skip = "skip"
+    update = "update"
+
+
+class BulkRowResult(SQLModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkResult(SQLModel):
+    written: int = 0
+    skipped: int = 0
+    failed: int = 0
+    rows: list[BulkRowResult] = []
+
+
+async def read_bulk_body(request: Request) -> list[Any]:
+    """Parse a JSON array or NDJSON request body into a list of raw rows."""
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = json.loads(body)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed request body!"
+        )
+    if not isinstance(rows, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON array or NDJSON body!",
+        )
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_ROWS} rows per bulk request!",
+        )
+    return rows
+
+
+def build_insert(model: Any, values: list[dict], conflict_key: str, mode: ConflictMode):
+    dialect = get_engine().dialect
+    insert = DIALECT_INSERTS.get(dialect.name)
+    if insert is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"Bulk writes are not supported on {dialect.name}!",
+        )
+    stmt = insert(model).values(values)
+    if mode == ConflictMode.update:
+        columns = [key for key in values[0] if key != conflict_key]
+        return stmt.on_conflict_do_update(
+            index_elements=[conflict_key],
+            set_={column: stmt.excluded[column] for column in columns},
+        )
+    return stmt.on_conflict_do_nothing()
+
+
+def supports_returning() -> bool:
+    dialect = get_engine().dialect
+    return getattr(
+        dialect, "insert_returning", getattr(dialect, "full_returning", False)
+    )
+
+
+async def bulk_insert(
+    session: AsyncSession,
+    model: Any,
+    schema: Type[SQLModel],
+    raw_rows: list[Any],
+    conflict_key: str,
+    mode: ConflictMode,
+) -> BulkResult:
+    """Insert ``raw_rows`` in batches, resolving conflicts on ``conflict_key``.
+
+    Each batch is one multi-row INSERT ... RETURNING and one commit. Rows that
+    fail validation are reported and left out; if the database rejects a
+    batch it is retried row by row so every failing row gets its own error.
+    """
+    result = BulkResult()
+    errors: dict[int, str] = {}
+    pending: list[tuple[int, dict]] = []
+    seen_keys = set()
+    for index, raw in enumerate(raw_rows):
+        try:
+            values = schema.parse_obj(raw).dict()
+        except ValidationError as exc:
+            errors[index] = str(exc)
+            continue
+        if values[conflict_key] in seen_keys:
+            errors[index] = f"Duplicate {conflict_key} in request!"
+            continue
+        seen_keys.add(values[conflict_key])
+        pending.append((index, values))
+
+    ids: dict[Any, int] = {}
+    for start in range(0, len(pending), BULK_BATCH_SIZE):
+        batch = pending[start : start + BULK_BATCH_SIZE]
+        existing = set()
+        if mode == ConflictMode.update:
+            keys = [values[conflict_key] for _, values in batch]
+            existing = await existing_keys(session, model, conflict_key, keys)
+        try:
+            written = await insert_batch(session, model, batch, conflict_key, mode)
+            if written:
+                await record_write(session, model.__tablename__)
+            await session.commit()
+        except DBAPIError:
+            await session.rollback()
+            written = await isolate_rows(
+                session, model, batch, conflict_key, mode, errors
+            )
+        for _, values in batch:
+            key = values[conflict_key]
+            if key in written:
+                op = "update" if key in existing else "insert"
+                publish_change(model.__tablename__, op, {**values, "id": written[key]})
+        ids.update(written)
+
+    row_status = "upserted" if mode == ConflictMode.update else "inserted"
+    for index, values in pending:
+        key = values[conflict_key]
+        if key in ids:
+            result.rows.append(
+                BulkRowResult(index=index, status=row_status, id=ids[key])
+            )
+        elif index not in errors:
+            result.rows.append(BulkRowResult(index=index, status="skipped"))
+    result.rows.extend(
+        BulkRowResult(index=index, status="error", error=error)
+        for index, error in errors.items()
+    )
+    result.rows.sort(key=lambda row: row.index)
+    for row in result.rows:
+        if row.status == "error":
+            result.failed += 1
+        elif row.status == "skipped":
+            result.skipped += 1
+        else:
+            result.written += 1
+    return result
+
+
+async def existing_keys(
+    session: AsyncSession, model: Any, conflict_key: str, keys: list[Any]
+) -> set[Any]:
+    """Which of ``keys`` are taken already, so upserts publish what they did."""
+    key_column = getattr(model, conflict_key)
+    stmt = select(key_column).where(key_column.in_(keys))
+    return set((await session.execute(stmt)).scalars())
+
+
+async def insert_batch(
+    session: AsyncSession,
+    model: Any,
+    batch: list[tuple[int, dict]],
+    conflict_key: str,
+    mode: ConflictMode,
+) -> dict[Any, int]:
+    """Insert one batch and map the conflict key of every written row to its id."""
+    key_column = getattr(model, conflict_key)
+    if supports_returning():
+        stmt = build_insert(model, [values for _, values in batch], conflict_key, mode)
+        rows = (await session.execute(stmt.returning(key_column, model.id))).all()
+        return {key: row_id for key, row_id in rows}
+
+    # Without RETURNING run one INSERT per row in the same transaction and
+    # read the ids of written rows back with a single SELECT.
+    written = []
+    for _, values in batch:
+        stmt = build_insert(model, [values], conflict_key, mode)
+        if (await session.execute(stmt)).rowcount:
+            written.append(values[conflict_key])
+    if not written:
+        return {}
+    stmt = select(key_column, model.id).where(key_column.in_(written))
+    return {key: row_id for key, row_id in (await session.execute(stmt)).all()}
+
+
+async def isolate_rows(
+    session: AsyncSession,
+    model: Any,
+    batch: list[tuple[int, dict]],
+    conflict_key: str,
+    mode: ConflictMode,
+    errors: dict[int, str],
+) -> dict[Any, int]:
+    """Retry a rejected batch one row per transaction to pin down bad rows."""
+    ids = {}
+    for index, values in batch:
+        try:
+            written = await insert_batch(
+                session, model, [(index, values)], conflict_key, mode
+            )
+            if written:
+                await record_write(session, model.__tablename__)
+            await session.commit()
+            ids.update(written)
+        except DBAPIError as exc:
+            await session.rollback()
+            errors[index] = str(exc.orig)
+    return ids
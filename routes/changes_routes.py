@@ -0,0 +1,100 @@
+import asyncio
+from enum import Enum
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+
+from database.feed import FeedEntry, change_feed
+from database.settings import settings
+from routes.serialization import dumps
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+
+class FeedResource(str, Enum):
+    cities = "cities"
+    heroes = "heroes"
+    teams = "teams"
+
+
+def format_event(entry: FeedEntry) -> bytes:
+    event = entry.event
+    if event.op == "reset":
+        # Another worker wrote the table, its rows are not known here.
+        name, data = "reset", {"seq": entry.seq, "table": event.table}
+    else:
+        name = "change"
+        data = {
+            "seq": entry.seq,
+            "table": event.table,
+            "op": event.op,
+            "row": event.row,
+        }
+    return (
+        f"id: {change_feed.cursor(entry.seq)}\nevent: {name}\ndata: ".encode()
+        + dumps(data)
+        + b"\n\n"
+    )
+
+
+def format_reset() -> bytes:
+    # The client missed changes and must reload its lists; the id lets it
+    # resume from here afterwards.
+    cursor = change_feed.cursor(change_feed.seq)
+    return f"id: {cursor}\nevent: reset\ndata: {{}}\n\n".encode()
+
+
+async def stream_changes(
+    tables: frozenset[str], cursor: Optional[str]
+) -> AsyncIterator[bytes]:
+    # Nothing is awaited between subscribing and reading the backlog, so
+    # every change is in exactly one of them.
+    subscription = change_feed.subscribe(tables, settings.change_feed_queue)
+    backlog: Optional[list[FeedEntry]] = []
+    if cursor is not None:
+        seq = change_feed.parse_cursor(cursor)
+        backlog = None if seq is None else change_feed.since(seq, tables)
+    reset = format_reset() if backlog is None else None
+    try:
+        yield f"retry: {settings.change_feed_retry_ms}\n\n".encode()
+        if reset is not None:
+            yield reset
+        for entry in backlog or ():
+            yield format_event(entry)
+        while True:
+            try:
+                entry = await subscription.next(settings.change_feed_heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection.
+                yield b": keepalive\n\n"
+                continue
+            if entry is None:
+                return
+            yield format_event(entry)
+    finally:
+        change_feed.unsubscribe(subscription)
+
+
+@router.get("/", response_class=StreamingResponse)
+async def get_changes(
+    resource: list[FeedResource]
+    | None = Query(default=None, description="Only stream changes to these resources."),
+    after: str
+    | None = Query(default=None, description="Resume after this event id (cursor)."),
+    last_event_id: str | None = Header(default=None),
+):
+    """Server-sent events for every create, update and delete of the resources.
+
+    Without a cursor the stream starts with the next change. With one, the
+    changes after it are sent first; if they are no longer available a
+    ``reset`` event asks the client to reload before applying new changes.
+    A ``reset`` naming a table is sent when another worker wrote it, and
+    asks the client to reload just that resource.
+    """
+    tables = frozenset(item.value for item in resource or FeedResource)
+    return StreamingResponse(
+        stream_changes(tables, last_event_id or after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
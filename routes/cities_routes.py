@@ -1,87 +1,190 @@
-from typing import Union
-
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
-
-from database.db import get_session
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status, Request
+from fastapi.responses import StreamingResponse
+
+from database.cache import ReadCache
+from database.changes import publish_change
+from database.coalescer import insert_op, run_write, update_op
+from database.repository import ReadRepository
+from database.settings import settings
+from database.snapshot import TableSnapshot
+from database.search import (
+    DEFAULT_SEARCH_LIMIT,
+    MAX_SEARCH_LIMIT,
+    SearchMode,
+    TableSearch,
+)
+from database.db import get_async_session
+from models.page import Batch, Page
+from routes.batch import batch_ids, batch_response
+from routes.bulk import BulkResult, ConflictMode, bulk_insert, read_bulk_body
+from routes.export import ExportFormat, export_response
+from routes.fields import FieldSelection, pick
+from routes.pagination import PageParams, paginate_rows
+from routes.serialization import (
+    FastJSONResponse,
+    item_response,
+    page_response,
+)
 from models.city import City, CityRead, CityCreate, CityPatchName, CityPatchCapital
 
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 router = APIRouter(prefix="/cities", tags=["Cities"])
 
+city_repository = ReadRepository(City, CityRead)
+city_cache = ReadCache("cities", city_repository)
+city_snapshot = (
+    TableSnapshot(city_repository, keys=("name", "capital_city"))
+    if settings.cities_snapshot
+    else None
+)
+city_search = TableSearch(city_repository, ("name", "capital_city"))
+
+
+def city_reads() -> TableSnapshot | ReadCache:
+    """The in-memory snapshot once it is loaded, otherwise the DB backed cache."""
+    if city_snapshot is not None and city_snapshot.loaded:
+        return city_snapshot
+    return city_cache
+
 
 @router.get(
-    "/", response_model=Union[list[City], CityRead, str], status_code=status.HTTP_200_OK
+    "/",
+    response_model=Page[CityRead],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
 )
 async def get_all_cities(
     query: str
     | None = Query(
-        default=None, description="Search by city name.", min_length=3, max_length=25
+        default=None,
+        description="Search by city name, the page holds the matching city.",
+        min_length=3,
+        max_length=25,
     ),
-    session: Session = Depends(get_session),
-) -> Union[list[City], CityRead, str]:
+    page: PageParams = Depends(),
+    fields: tuple[str, ...] | None = Depends(FieldSelection(CityRead)),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
     if query:
-        stmt = select(City).where(City.name == query)
-        founded_cities = session.exec(stmt).first()
+        founded_cities = await city_reads().get_by(session, "name", query)
         if founded_cities is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"City with query param = {query} not found!",
             )
-        return founded_cities
-    cities = session.exec(select(City)).all()
-    return cities
+        # A one-item page, so the list schema holds for lookups too.
+        return page_response([founded_cities], None, pick(fields))
+    cities, next_cursor = await paginate_rows(session, city_reads(), page, fields)
+    return page_response(cities, next_cursor)
+
 
+@router.get(
+    "/batch",
+    response_model=Batch[CityRead],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_cities_by_ids(
+    ids: list[int] = Depends(batch_ids),
+    fields: tuple[str, ...] | None = Depends(FieldSelection(CityRead)),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    cities = await city_reads().get_many(session, ids)
+    return batch_response(ids, cities, pick(fields))
+
+
+@router.get(
+    "/search",
+    response_model=Page[CityRead],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def search_cities(
+    q: str = Query(
+        min_length=1,
+        max_length=50,
+        description="Text to look for in the city name or capital.",
+    ),
+    mode: SearchMode = Query(
+        default=SearchMode.prefix,
+        description="prefix matches the start of a value, fuzzy also tolerates typos.",
+    ),
+    limit: int = Query(default=DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    cities = await city_search.search(session, q, mode, limit)
+    return page_response(cities, None)
 
-@router.get("/{city_id}", response_model=CityRead, status_code=status.HTTP_200_OK)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_cities(
+    export_format: ExportFormat = Query(
+        default=ExportFormat.ndjson, alias="format", description="Export format."
+    ),
+) -> StreamingResponse:
+    if city_snapshot is not None and city_snapshot.loaded:
+        return export_response(city_snapshot, export_format)
+    return export_response(city_repository, export_format)
+
+
+@router.get(
+    "/{city_id}",
+    response_model=CityRead,
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
 async def get_city_by_id(
     city_id: int = Path(title="City ID", description="Get city by ID param."),
-    session: Session = Depends(get_session),
-) -> CityRead:
-    city = session.get(City, city_id)
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    city = await city_reads().get(session, city_id)
     if city is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"City with ID = {city_id} was not found",
         )
-    return city
+    return item_response(city)
 
 
 @router.post("/", response_model=CityRead, status_code=status.HTTP_201_CREATED)
 async def create_new_city(
-    city: CityCreate, session: Session = Depends(get_session)
+    city: CityCreate, session: AsyncSession = Depends(get_async_session)
 ) -> CityRead:
-    db_city = City.from_orm(city)
-    if not db_city:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Something went wrong!"
-        )
-    session.add(db_city)
-    session.commit()
-    session.refresh(db_city)
+    db_city = await run_write(session, insert_op(City, city))
+    publish_change("cities", "insert", db_city.dict())
     return db_city
 
 
+@router.post("/bulk", response_model=BulkResult, status_code=status.HTTP_200_OK)
+async def bulk_create_cities(
+    request: Request,
+    on_conflict: ConflictMode = Query(
+        default=ConflictMode.skip, description="Skip or update rows with a taken name."
+    ),
+    session: AsyncSession = Depends(get_async_session),
+) -> BulkResult:
+    rows = await read_bulk_body(request)
+    return await bulk_insert(session, City, CityCreate, rows, "name", on_conflict)
+
+
 @router.patch(
     "/{city_id}/name", response_model=CityRead, status_code=status.HTTP_200_OK
 )
 async def patch_city_name_by_id(
     city: CityPatchName,
     city_id: int = Path(title="City ID", description="Patch city name by ID"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> CityRead:
-    city_db = session.get(City, city_id)
-    if not city_db:
+    city_data = city.dict(exclude_unset=True)
+    updated = await run_write(session, update_op(City, city_id, city_data))
+    if updated is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"City with ID = {city_id} was not found!",
         )
-    city_data = city.dict(exclude_unset=True)
-    for key, value in city_data.items():
-        setattr(city_db, key, value)
-    session.add(city_db)
-    session.commit()
-    session.refresh(city_db)
+    city_db, old_values = updated
+    publish_change("cities", "update", city_db.dict(), old_values)
     return city_db
 
 
@@ -93,20 +196,17 @@ async def patch_city_name_by_id(
     city_id: int = Path(
         title="City ID", description="Patch city capital name by city ID."
     ),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> CityRead:
-    city_db = session.get(City, city_id)
-    if not city_db:
+    city_data = city.dict(exclude_unset=True)
+    updated = await run_write(session, update_op(City, city_id, city_data))
+    if updated is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"City with ID = {city_id} was not found!",
         )
-    city_data = city.dict(exclude_unset=True)
-    for key, value in city_data.items():
-        setattr(city_db, key, value)
-    session.add(city_db)
-    session.commit()
-    session.refresh(city_db)
+    city_db, old_values = updated
+    publish_change("cities", "update", city_db.dict(), old_values)
     return city_db
 
 
@@ -115,14 +215,15 @@ async def patch_city_name_by_id(
 )
 async def delete_city_by_id(
     city_id: int = Path(title="City ID", description="Delete city by ID."),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> None:
-    city = session.get(City, city_id)
+    city = await session.get(City, city_id)
     if not city:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"City with ID = {city_id} was not found!",
         )
-    session.delete(city)
-    session.commit()
+    await session.delete(city)
+    await session.commit()
+    publish_change("cities", "delete", city.dict())
     return None
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, status
+
+from database.cache import caches
+from database.coalescer import coalescer
+from database.db import get_async_engine, get_engine
+from database.feed import change_feed
+from database.pool import pool_status
+from database.settings import settings
+from database.snapshot import snapshots
+
+router = APIRouter(prefix="/diagnostics", tags=["Diagnostics"])
+
+
+@router.get("/cache", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+@router.get("/pool", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_pool_stats() -> dict:
+    max_overflow = settings.db_max_overflow
+    stats = {"sync": pool_status(get_engine().pool, max_overflow)}
+    async_engine = get_async_engine()
+    if async_engine is not None:
+        stats["async"] = pool_status(async_engine.sync_engine.pool, max_overflow)
+    return stats
+
+
+@router.get("/snapshots", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_snapshot_stats() -> dict:
+    return {name: snapshot.stats() for name, snapshot in snapshots.items()}
+
+
+@router.get("/writes", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_write_stats() -> dict:
+    return {
+        "coalescing": coalescer is not None,
+        **(coalescer.stats() if coalescer else {}),
+    }
+
+
+@router.get("/changes", response_model=dict, status_code=status.HTTP_200_OK)
+async def get_change_feed_stats() -> dict:
+    return change_feed.stats()
@@ -0,0 +1,69 @@
+import csv
+import io
+from enum import Enum
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+from database.db import session_scope
+from database.repository import ReadRepository
+from routes.serialization import dumps
+
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+async def iter_batches(
+    repository: ReadRepository, batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[list[dict]]:
+    """Yield every row of the repository's table in id order, batch by batch.
+
+    Rows are plain dicts read with keyset batches, so only a single batch is
+    ever held in memory and exports stay flat however large the table grows.
+    """
+    async with session_scope() as session:
+        last_id = None
+        while True:
+            rows = await repository.fetch_page(session, batch_size, last_id)
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]["id"]
+
+
+# One chunk per batch rather than per row, as every chunk is a separate
+# send through the middleware stack.
+async def iter_ndjson(repository: ReadRepository) -> AsyncIterator[bytes]:
+    async for rows in iter_batches(repository):
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+
+async def iter_csv(repository: ReadRepository) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=repository.fields)
+    writer.writeheader()
+    async for rows in iter_batches(repository):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_response(
+    repository: ReadRepository, export_format: ExportFormat
+) -> StreamingResponse:
+    filename = f"{repository.table.name}.{export_format.value}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if export_format == ExportFormat.csv:
+        return StreamingResponse(
+            iter_csv(repository), media_type="text/csv", headers=headers
+        )
+    return StreamingResponse(
+        iter_ndjson(repository), media_type="application/x-ndjson", headers=headers
+    )
@@ -0,0 +1,58 @@
+from typing import Any, Callable, Optional, Sequence, Type
+
+from fastapi import HTTPException, Query, status
+from sqlmodel import SQLModel
+
+
+class FieldSelection:
+    """Dependency parsing ``?fields=id,name`` against the fields of a schema.
+
+    Returns the selected fields in schema order, always with ``id`` since
+    pages and batches are keyed by it, or None when all fields are wanted.
+    """
+
+    def __init__(self, schema: Type[SQLModel]):
+        self.names = tuple(schema.__fields__)
+
+    def __call__(
+        self,
+        fields: str
+        | None = Query(
+            default=None,
+            description="Comma separated fields to return, e.g. id,name. "
+            "The id is always included.",
+        ),
+    ) -> Optional[tuple[str, ...]]:
+        if fields is None:
+            return None
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested.difference(self.names)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}!",
+            )
+        requested.add("id")
+        return tuple(name for name in self.names if name in requested)
+
+
+def pick(
+    fields: Optional[Sequence[str]],
+    serialize: Optional[Callable[[Any], dict]] = None,
+) -> Optional[Callable[[Any], dict]]:
+    """Serializer keeping only ``fields`` of each row.
+
+    Rows are dicts, or ORM rows turned into dicts by ``serialize`` first.
+    Without ``fields`` this is just ``serialize``.
+    """
+    if fields is None:
+        return serialize
+    if serialize is None:
+        # Relations are only in rows read with them, e.g. ?include=team.
+        return lambda row: {name: row[name] for name in fields if name in row}
+
+    def serialize_fields(row: Any) -> dict:
+        data = serialize(row)
+        return {name: data[name] for name in fields}
+
+    return serialize_fields
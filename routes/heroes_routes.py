@@ -1,74 +1,186 @@
-from typing import Union
-from fastapi import APIRouter, Depends, Path, Query, HTTPException, status
-from sqlmodel import Session, select
-
-
-from database.db import get_session
+from enum import Enum
+from fastapi import APIRouter, Depends, Path, Query, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+from database.cache import ReadCache
+from database.changes import publish_change
+from database.coalescer import insert_op, run_write
+from database.repository import ReadRepository
+from database.search import (
+    DEFAULT_SEARCH_LIMIT,
+    MAX_SEARCH_LIMIT,
+    SearchMode,
+    TableSearch,
+)
+from database.db import get_async_session
+from models.page import Batch, Page
+from routes.batch import batch_ids, batch_response, fetch_many
+from routes.bulk import BulkResult, ConflictMode, bulk_insert, read_bulk_body
+from routes.export import ExportFormat, export_response
+from routes.fields import FieldSelection, pick
+from routes.pagination import PageParams, paginate, paginate_rows
+from routes.serialization import (
+    FastJSONResponse,
+    item_response,
+    page_response,
+    row_serializer,
+)
 
 from models.hero import Hero, HeroCreate, HeroRead, HeroReadWithTeams
-from models.team import Team
+from models.team import Team, TeamRead
 
 
 router = APIRouter(prefix="/heroes", tags=["Heroes"])
 
+hero_repository = ReadRepository(Hero, HeroRead)
+hero_cache = ReadCache("heroes", hero_repository)
+hero_search = TableSearch(hero_repository, ("name", "secret_name"))
+serialize_hero_with_team = row_serializer(
+    HeroReadWithTeams, nested={"team": row_serializer(TeamRead)}
+)
+
+
+class HeroInclude(str, Enum):
+    team = "team"
+
 
 @router.get(
-    "/", response_model=Union[list[Hero], HeroRead, str], status_code=status.HTTP_200_OK
+    "/",
+    response_model=Page[HeroReadWithTeams],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
 )
 async def get_all_heroes(
     query: str
     | None = Query(
         default=None,
-        description="Search for heroes by hero name.",
+        description="Search for heroes by hero name, the page holds the matching hero.",
         min_length=2,
         max_length=25,
     ),
-    session: Session = Depends(get_session),
-) -> Union[list[Hero], HeroRead, str]:
+    include: HeroInclude
+    | None = Query(default=None, description="Load related rows with each hero."),
+    page: PageParams = Depends(),
+    fields: tuple[str, ...] | None = Depends(FieldSelection(HeroReadWithTeams)),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
     if query:
-        stmt = select(Hero).where(Hero.name == query)
-        foundned_heroes = session.exec(stmt).first()
+        foundned_heroes = await hero_cache.get_by(session, "name", query)
         if not foundned_heroes:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Hero with name = {query} not found!",
             )
-        return foundned_heroes
-    heroes = session.exec(select(Hero)).all()
-    return heroes
+        return page_response([foundned_heroes], None, pick(fields))
+    if include == HeroInclude.team:
+        # One extra IN query loads the teams of the whole page.
+        options = [selectinload(Hero.team)]
+        heroes, next_cursor = await paginate(session, Hero, page, options)
+        serialize = pick(fields, serialize_hero_with_team)
+        return page_response(heroes, next_cursor, serialize)
+    heroes, next_cursor = await paginate_rows(session, hero_cache, page, fields)
+    return page_response(heroes, next_cursor)
+
+
+@router.get(
+    "/batch",
+    response_model=Batch[HeroReadWithTeams],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_heroes_by_ids(
+    ids: list[int] = Depends(batch_ids),
+    include: HeroInclude
+    | None = Query(default=None, description="Load related rows with each hero."),
+    fields: tuple[str, ...] | None = Depends(FieldSelection(HeroReadWithTeams)),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    if include == HeroInclude.team:
+        options = [selectinload(Hero.team)]
+        heroes = await fetch_many(session, Hero, ids, options)
+        return batch_response(ids, heroes, pick(fields, serialize_hero_with_team))
+    heroes = await hero_cache.get_many(session, ids)
+    return batch_response(ids, heroes, pick(fields))
+
+
+@router.get(
+    "/search",
+    response_model=Page[HeroRead],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def search_heroes(
+    q: str = Query(
+        min_length=1,
+        max_length=50,
+        description="Text to look for in the hero name or secret name.",
+    ),
+    mode: SearchMode = Query(
+        default=SearchMode.prefix,
+        description="prefix matches the start of a value, fuzzy also tolerates typos.",
+    ),
+    limit: int = Query(default=DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    heroes = await hero_search.search(session, q, mode, limit)
+    return page_response(heroes, None)
 
 
-@router.get("/{hero_id}", response_model=HeroRead, status_code=status.HTTP_200_OK)
+@router.get("/export", response_class=StreamingResponse)
+async def export_heroes(
+    export_format: ExportFormat = Query(
+        default=ExportFormat.ndjson, alias="format", description="Export format."
+    ),
+) -> StreamingResponse:
+    return export_response(hero_repository, export_format)
+
+
+@router.get(
+    "/{hero_id}",
+    response_model=HeroRead,
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
 async def get_hero_by_id(
     hero_id: int = Path(
         default=None, title="Hero ID", description="Get hero by hero ID."
     ),
-    session: Session = Depends(get_session),
-) -> HeroRead:
-    hero = session.get(Hero, hero_id)
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    hero = await hero_cache.get(session, hero_id)
     if hero is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Hero with ID = {hero_id} not found!",
         )
-    return hero
+    return item_response(hero)
 
 
 @router.post("/", response_model=HeroRead, status_code=status.HTTP_201_CREATED)
 async def create_new_herose(
-    hero: HeroCreate, session: Session = Depends(get_session)
+    hero: HeroCreate, session: AsyncSession = Depends(get_async_session)
 ) -> HeroRead:
-    db_hero = Hero.from_orm(hero)
-    if not db_hero:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create new hero!"
-        )
-    session.add(db_hero)
-    session.commit()
-    session.refresh(db_hero)
+    db_hero = await run_write(session, insert_op(Hero, hero))
+    publish_change("heroes", "insert", db_hero.dict())
     return db_hero
 
 
+@router.post("/bulk", response_model=BulkResult, status_code=status.HTTP_200_OK)
+async def bulk_create_heroes(
+    request: Request,
+    on_conflict: ConflictMode = Query(
+        default=ConflictMode.skip, description="Skip or update rows with a taken name."
+    ),
+    session: AsyncSession = Depends(get_async_session),
+) -> BulkResult:
+    rows = await read_bulk_body(request)
+    return await bulk_insert(session, Hero, HeroCreate, rows, "name", on_conflict)
+
+
 @router.delete(
     "/{hero_id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT
 )
@@ -76,22 +188,24 @@ async def delete_hero_by_id(
     hero_id: int = Path(
         default=None, title="Hero ID", description="Delete hero by hero ID"
     ),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> None:
-    db_hero = session.get(Hero, hero_id)
+    db_hero = await session.get(Hero, hero_id)
     if not db_hero:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Hero with ID = {hero_id} not found!",
         )
-    session.delete(db_hero)
-    session.commit()
+    await session.delete(db_hero)
+    await session.commit()
+    publish_change("heroes", "delete", db_hero.dict())
     return None
 
 
 @router.get(
     "/{hero_id}/teams",
-    response_model=Union[HeroRead, HeroReadWithTeams],
+    response_model=HeroReadWithTeams,
+    response_class=FastJSONResponse,
     status_code=status.HTTP_200_OK,
 )
 async def get_hero_by_id_with_team(
@@ -102,30 +216,31 @@ async def get_hero_by_id_with_team(
     show_team: bool = Query(
         default=False, description="Switch showing team relationship True/False."
     ),
-    session: Session = Depends(get_session),
-) -> Union[HeroRead, HeroReadWithTeams]:
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
     if show_team:
-        hero = session.get(Hero, hero_id)
+        # Async sessions cannot lazy load, so pull the team in up front.
+        hero = await session.get(Hero, hero_id, options=[selectinload(Hero.team)])
         if not hero:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Hero with ID = {hero_id} not found!",
             )
-        return hero
+        return item_response(hero, serialize_hero_with_team)
 
-    hero_with_team = session.get(Hero, hero_id)
+    hero_with_team = await hero_cache.get(session, hero_id)
     if not hero_with_team:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Hero with ID = {hero_id} not found!",
         )
-    return hero_with_team
+    return item_response(hero_with_team)
 
 
 @router.get("/test/", response_model=list[Hero], status_code=status.HTTP_200_OK)
 async def get_hero_with_team_test(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     stmt = select(Hero, Team).join(Team)
-    results = session.exec(stmt).all()
+    results = (await session.exec(stmt)).all()
     return results
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from middleware.metrics import render_metrics
+
+router = APIRouter(tags=["Diagnostics"])
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    include_in_schema=False,
+)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
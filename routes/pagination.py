@@ -0,0 +1,100 @@
+import base64
+import json
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException, Query, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database.repository import ReadRepository
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class PageParams:
+    """Query params shared by the list endpoints.
+
+    Keyset pagination over the ``id`` primary key is the default, ``offset``
+    is kept as a fallback for clients that need to jump to a page.
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(
+            default=DEFAULT_PAGE_SIZE,
+            ge=1,
+            le=MAX_PAGE_SIZE,
+            description="Max number of items on the page.",
+        ),
+        cursor: str
+        | None = Query(default=None, description="Cursor returned as next_cursor."),
+        offset: int
+        | None = Query(default=None, ge=0, description="Offset fallback to cursor."),
+    ):
+        if cursor is not None and offset is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Use either cursor or offset, not both!",
+            )
+        self.limit = limit
+        self.cursor = cursor
+        self.offset = offset
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor!"
+        )
+    return last_id
+
+
+async def paginate(
+    session: AsyncSession, model: Any, page: PageParams, options: Sequence[Any] = ()
+) -> tuple[list[Any], Optional[str]]:
+    """Fetch one page of ``model`` ordered by id and the cursor of the next one.
+
+    ``options`` are loader options, e.g. ``selectinload`` of a relationship.
+    """
+    stmt = select(model).options(*options).order_by(model.id)
+    if page.cursor is not None:
+        stmt = stmt.where(model.id > decode_cursor(page.cursor))
+    elif page.offset:
+        stmt = stmt.offset(page.offset)
+    # One extra row tells us whether there is a next page.
+    items = (await session.exec(stmt.limit(page.limit + 1))).all()
+    if len(items) > page.limit:
+        items = items[: page.limit]
+        return items, encode_cursor(items[-1].id)
+    return items, None
+
+
+async def paginate_rows(
+    session: AsyncSession,
+    repository: ReadRepository,
+    page: PageParams,
+    fields: Optional[Sequence[str]] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """Like paginate, but reads plain dicts through a ReadRepository (or cache).
+
+    ``fields`` narrows the rows to those columns; it must include ``id``.
+    """
+    after_id = decode_cursor(page.cursor) if page.cursor is not None else None
+    rows = await repository.fetch_page(
+        session, page.limit + 1, after_id, page.offset, fields
+    )
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        return rows, encode_cursor(rows[-1]["id"])
+    return rows, None
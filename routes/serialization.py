@@ -0,0 +1,74 @@
+import json
+from operator import attrgetter
+from typing import Any, Callable, Optional, Sequence, Type
+
+from fastapi.responses import JSONResponse
+from sqlmodel import SQLModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), default=str).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def row_serializer(
+    schema: Type[SQLModel], nested: Optional[dict[str, Callable]] = None
+) -> Callable[[Any], dict]:
+    """Build a function turning an ORM row (or schema instance) into a dict.
+
+    Only the fields of ``schema`` are read, with one precomputed attrgetter,
+    which skips pydantic validation and jsonable_encoder entirely. ``nested``
+    maps relationship fields to the serializer of the related schema.
+    """
+    nested = nested or {}
+    fields = [name for name in schema.__fields__ if name not in nested]
+    getter = attrgetter(*fields)
+    if len(fields) == 1:
+        base = lambda row: {fields[0]: getter(row)}  # noqa: E731
+    else:
+        base = lambda row: dict(zip(fields, getter(row)))  # noqa: E731
+    if not nested:
+        return base
+
+    def serialize(row: Any) -> dict:
+        data = base(row)
+        for name, serialize_related in nested.items():
+            related = getattr(row, name)
+            if related is None:
+                data[name] = None
+            elif isinstance(related, (list, tuple)):
+                data[name] = [serialize_related(item) for item in related]
+            else:
+                data[name] = serialize_related(related)
+        return data
+
+    return serialize
+
+
+def item_response(
+    row: Any, serialize: Optional[Callable[[Any], dict]] = None
+) -> FastJSONResponse:
+    """Render one row; rows that are already dicts need no ``serialize``."""
+    return FastJSONResponse(row if serialize is None else serialize(row))
+
+
+def page_response(
+    rows: Sequence[Any],
+    next_cursor: Optional[str],
+    serialize: Optional[Callable[[Any], dict]] = None,
+) -> FastJSONResponse:
+    items = rows if serialize is None else [serialize(row) for row in rows]
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
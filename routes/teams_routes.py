@@ -1,66 +1,199 @@
-from typing import Union
-from fastapi import APIRouter, Query, Path, Depends, HTTPException, status
-from sqlmodel import Session, select
-from database.db import get_session
+from enum import Enum
+from fastapi import APIRouter, Query, Path, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database.cache import ReadCache
+from database.changes import publish_change
+from database.coalescer import insert_op, run_write, update_op
+from database.repository import ReadRepository
+from database.search import (
+    DEFAULT_SEARCH_LIMIT,
+    MAX_SEARCH_LIMIT,
+    SearchMode,
+    TableSearch,
+)
+from database.db import get_async_session
+from models.page import Batch, Page
+from routes.batch import batch_ids, batch_response, fetch_many
+from routes.bulk import BulkResult, ConflictMode, bulk_insert, read_bulk_body
+from routes.export import ExportFormat, export_response
+from routes.fields import FieldSelection, pick
+from routes.pagination import PageParams, paginate, paginate_rows
+from routes.serialization import (
+    FastJSONResponse,
+    item_response,
+    page_response,
+    row_serializer,
+)
 
+from models.hero import HeroRead, TeamWithHeroRead
 from models.team import Team, TeamCreate, TeamRead, TeamUpdate
 
 router = APIRouter(prefix="/teams", tags=["Teams"])
 
+team_repository = ReadRepository(Team, TeamRead)
+team_cache = ReadCache("teams", team_repository)
+team_search = TableSearch(team_repository, ("name",))
+serialize_team_with_heroes = row_serializer(
+    TeamWithHeroRead, nested={"heroes": row_serializer(HeroRead)}
+)
+
+
+class TeamInclude(str, Enum):
+    heroes = "heroes"
+
 
 @router.get(
-    "/", response_model=Union[list[Team], TeamRead, str], status_code=status.HTTP_200_OK
+    "/",
+    response_model=Page[TeamWithHeroRead],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
 )
 async def get_all_teams(
-    query: str = Query(default=None, description="Search team by name."),
-    session: Session = Depends(get_session),
-) -> Union[list[Team], TeamRead, str]:
+    query: str = Query(
+        default=None,
+        description="Search team by name, the page holds the matching team.",
+    ),
+    include: TeamInclude
+    | None = Query(default=None, description="Load related rows with each team."),
+    page: PageParams = Depends(),
+    fields: tuple[str, ...] | None = Depends(FieldSelection(TeamWithHeroRead)),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
     if query:
-        stmt = select(Team).where(Team.name == query)
-        team = session.exec(stmt).first()
+        team = await team_cache.get_by(session, "name", query)
         if not team:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Team with query name = {query} not found!",
             )
-        return team
-    teams = session.exec(select(Team)).all()
-    if not teams:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Teams not found!"
-        )
-    return teams
+        return page_response([team], None, pick(fields))
+    if include == TeamInclude.heroes:
+        # One extra IN query loads the heroes of the whole page.
+        options = [selectinload(Team.heroes)]
+        teams, next_cursor = await paginate(session, Team, page, options)
+    else:
+        teams, next_cursor = await paginate_rows(session, team_cache, page, fields)
+    if include == TeamInclude.heroes:
+        serialize = pick(fields, serialize_team_with_heroes)
+        return page_response(teams, next_cursor, serialize)
+    return page_response(teams, next_cursor)
 
 
-@router.get("/{team_id}", response_model=TeamRead, status_code=status.HTTP_200_OK)
+@router.get(
+    "/batch",
+    response_model=Batch[TeamWithHeroRead],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_teams_by_ids(
+    ids: list[int] = Depends(batch_ids),
+    include: TeamInclude
+    | None = Query(default=None, description="Load related rows with each team."),
+    fields: tuple[str, ...] | None = Depends(FieldSelection(TeamWithHeroRead)),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    if include == TeamInclude.heroes:
+        options = [selectinload(Team.heroes)]
+        teams = await fetch_many(session, Team, ids, options)
+        return batch_response(ids, teams, pick(fields, serialize_team_with_heroes))
+    teams = await team_cache.get_many(session, ids)
+    return batch_response(ids, teams, pick(fields))
+
+
+@router.get(
+    "/search",
+    response_model=Page[TeamRead],
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def search_teams(
+    q: str = Query(
+        min_length=1, max_length=50, description="Text to look for in the team name."
+    ),
+    mode: SearchMode = Query(
+        default=SearchMode.prefix,
+        description="prefix matches the start of a value, fuzzy also tolerates typos.",
+    ),
+    limit: int = Query(default=DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    teams = await team_search.search(session, q, mode, limit)
+    return page_response(teams, None)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_teams(
+    export_format: ExportFormat = Query(
+        default=ExportFormat.ndjson, alias="format", description="Export format."
+    ),
+) -> StreamingResponse:
+    return export_response(team_repository, export_format)
+
+
+@router.get(
+    "/{team_id}",
+    response_model=TeamRead,
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
 async def get_team_by_id(
     team_id: int = Path(default=None, title="Team ID", description="Get team by id."),
-    session: Session = Depends(get_session),
-) -> TeamRead:
-    team = session.get(Team, team_id)
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    team = await team_cache.get(session, team_id)
     if not team:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Team with ID = {team_id} not found!",
         )
-    return team
+    return item_response(team)
+
+
+@router.get(
+    "/{team_id}/heroes",
+    response_model=TeamWithHeroRead,
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_team_by_id_with_heroes(
+    *,
+    team_id: int = Path(
+        default=None, title="Team ID", description="Get team by ID with heroes."
+    ),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
+    team = await session.get(Team, team_id, options=[selectinload(Team.heroes)])
+    if not team:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Team with ID = {team_id} not found!",
+        )
+    return item_response(team, serialize_team_with_heroes)
 
 
 @router.post("/", response_model=TeamRead, status_code=status.HTTP_201_CREATED)
 async def create_new_team(
-    team: TeamCreate, session: Session = Depends(get_session)
+    team: TeamCreate, session: AsyncSession = Depends(get_async_session)
 ) -> TeamRead:
-    team_db = Team.from_orm(team)
-    if not team_db:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create new team!"
-        )
-    session.add(team_db)
-    session.commit()
-    session.refresh(team_db)
+    team_db = await run_write(session, insert_op(Team, team))
+    publish_change("teams", "insert", team_db.dict())
     return team_db
 
 
+@router.post("/bulk", response_model=BulkResult, status_code=status.HTTP_200_OK)
+async def bulk_create_teams(
+    request: Request,
+    on_conflict: ConflictMode = Query(
+        default=ConflictMode.skip, description="Skip or update rows with a taken name."
+    ),
+    session: AsyncSession = Depends(get_async_session),
+) -> BulkResult:
+    rows = await read_bulk_body(request)
+    return await bulk_insert(session, Team, TeamCreate, rows, "name", on_conflict)
+
+
 @router.put("/{team_id}", response_model=TeamRead, status_code=status.HTTP_200_OK)
 async def update_team_by_id(
     *,
@@ -68,20 +201,17 @@ async def update_team_by_id(
         default=None, title="Team ID", description="Get team to update by ID."
     ),
     team: TeamUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> TeamRead:
-    team_db = session.get(Team, team_id)
-    if not team_db:
+    team_data = team.dict(exclude_unset=True)
+    updated = await run_write(session, update_op(Team, team_id, team_data))
+    if updated is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Team with ID = {team_id} not found!",
         )
-    team_data = team.dict(exclude_unset=True)
-    for key, value in team_data.items():
-        setattr(team_db, key, value)
-    session.add(team_db)
-    session.commit()
-    session.refresh(team_db)
+    team_db, old_values = updated
+    publish_change("teams", "update", team_db.dict(), old_values)
     return team_db
 
 
@@ -93,33 +223,19 @@ async def delete_team_by_id(
     team_id: int = Path(
         default=None, title="Team ID", description="Delete team by id."
     ),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> None:
-    team = session.get(Team, team_id)
+    team = await session.get(Team, team_id, options=[selectinload(Team.heroes)])
     if not team:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Team with ID = {team_id} not found!",
         )
-    session.delete(team)
-    session.commit()
+    # Deleting the team clears team_id on its heroes, they change too.
+    heroes = [hero.dict() for hero in team.heroes]
+    await session.delete(team)
+    await session.commit()
+    publish_change("teams", "delete", team.dict())
+    for hero in heroes:
+        publish_change("heroes", "update", {**hero, "team_id": None}, hero)
     return None
-
-
-# @router.get(
-#     "/{team_id}/heroes", response_model=TeamWithHeroRead, status_code=status.HTTP_200_OK
-# )
-# async def get_team_by_id_with_heroes(
-#     *,
-#     team_id: int = Path(
-#         default=None, title="Team ID", description="Get team by ID with heroes."
-#     ),
-#     session: Session = Depends(get_session),
-# ) -> TeamWithHeroRead:
-#     team = session.get(Team, team_id)
-#     if not team:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail=f"Team with ID = {team_id} not found!",
-#         )
-#     return team
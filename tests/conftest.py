@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """The app on a throwaway SQLite database, with its lifespan running."""
+    url = "sqlite:///" + str(tmp_path_factory.mktemp("db") / "cities.sqlite")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("PSQL_URL", url)
+        monkeypatch.setenv("DB_CREATE_TABLES", "true")
+        from database.settings import settings
+
+        monkeypatch.setattr(settings, "psql_url", url)
+        monkeypatch.setattr(settings, "psql_async_url", None)
+        monkeypatch.setattr(settings, "db_create_tables", True)
+        from main import app
+
+        with TestClient(app) as client:
+            yield client
+
+
+@pytest.fixture
+def other_worker(client):
+    """Write like another worker would: straight to the database, bumping
+    the table's version without any of this worker's events."""
+    from database.db import get_engine
+
+    def write(table: str, sql: str, **params) -> None:
+        with get_engine().begin() as connection:
+            connection.execute(text(sql), params)
+            connection.execute(
+                text(
+                    "UPDATE table_versions SET version = version + 1, "
+                    "updated_at = :now WHERE table_name = :table"
+                ),
+                {"now": datetime.now(timezone.utc), "table": table},
+            )
+
+    return write
+
+
+@pytest.fixture
+def poll(client):
+    """Run one round of the version poller, as watch_versions does."""
+    from database.db import session_scope
+    from database.table_versions import refresh_versions
+
+    async def refresh() -> None:
+        async with session_scope() as session:
+            await refresh_versions(session)
+
+    return lambda: client.portal.call(refresh)
@@ -0,0 +1,120 @@
+"""Admission control sheds excess requests instead of queueing them forever."""
+import asyncio
+
+import pytest
+
+from middleware.admission import AdmissionControlMiddleware, Limiter
+
+
+def test_zero_queue_rejects_at_once():
+    async def scenario():
+        limiter = Limiter("/cities", 1, 0)
+        assert await limiter.acquire(1, timeout=1) is None
+        assert await limiter.acquire(0, timeout=1) == "queue_full"
+        limiter.release()
+        assert await limiter.acquire(1, timeout=1) is None
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_sheds_lower_priority_waiter():
+    async def scenario():
+        limiter = Limiter("/cities", 1, 1)
+        assert await limiter.acquire(1, timeout=1) is None
+        listing = asyncio.create_task(limiter.acquire(1, timeout=1))
+        await asyncio.sleep(0)
+        # A cheaper by-id read displaces the queued list request.
+        by_id = asyncio.create_task(limiter.acquire(0, timeout=1))
+        assert await listing == "shed"
+        # Nobody of lower priority is left to displace.
+        assert await limiter.acquire(0, timeout=1) == "queue_full"
+        limiter.release()
+        assert await by_id is None
+        assert limiter.active == 1
+
+    asyncio.run(scenario())
+
+
+def test_waiter_times_out_and_leaves_the_queue():
+    async def scenario():
+        limiter = Limiter("/cities", 1, 5)
+        assert await limiter.acquire(1, timeout=1) is None
+        assert await limiter.acquire(1, timeout=0.01) == "timeout"
+        assert limiter.waiters == []
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        limiter = Limiter("/cities", 1, 5)
+        assert await limiter.acquire(1, timeout=1) is None
+        waiter = asyncio.create_task(limiter.acquire(1, timeout=1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.waiters == []
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_handed_to_cancelled_waiter_is_released():
+    async def scenario():
+        limiter = Limiter("/cities", 1, 5)
+        assert await limiter.acquire(1, timeout=1) is None
+        waiter = asyncio.create_task(limiter.acquire(1, timeout=1))
+        await asyncio.sleep(0)
+        # The slot moves to the waiter, which is cancelled before it runs.
+        limiter.release()
+        waiter.cancel()
+        try:
+            granted = await waiter is None
+        except asyncio.CancelledError:
+            granted = False
+        if granted:
+            # wait_for may swallow a cancel arriving after the grant; the
+            # request then owns the slot and releases it when done.
+            limiter.release()
+        assert limiter.active == 0
+        assert await limiter.acquire(1, timeout=1) is None
+
+    asyncio.run(scenario())
+
+
+def test_rejected_request_gets_503_with_retry_after():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = AdmissionControlMiddleware(
+        app, {"/cities": 1}, max_queue=0, queue_timeout=1, retry_after=3
+    )
+
+    async def call(path: str) -> list[dict]:
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": path}
+        await middleware(scope, None, send)
+        return messages
+
+    async def scenario():
+        first = asyncio.create_task(call("/cities/"))
+        await asyncio.sleep(0)
+        rejected = await call("/cities/")
+        release.set()
+        assert (await first)[0]["status"] == 200
+        assert rejected[0]["status"] == 503
+        assert (b"retry-after", b"3") in rejected[0]["headers"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+"""The change feed describes every committed write the way it happened."""
+from database.feed import change_feed
+
+
+def events_since(seq: int) -> list[tuple[str, str, dict]]:
+    return [
+        (entry.event.table, entry.event.op, entry.event.row)
+        for entry in change_feed.backlog
+        if entry.seq > seq
+    ]
+
+
+def test_bulk_upsert_publishes_inserts_and_updates(client):
+    client.post("/cities/", json={"name": "Upsert Old", "capital_city": "A"})
+    seq = change_feed.seq
+    response = client.post(
+        "/cities/bulk?on_conflict=update",
+        json=[
+            {"name": "Upsert Old", "capital_city": "B"},
+            {"name": "Upsert New", "capital_city": "C"},
+        ],
+    )
+    assert response.json()["written"] == 2
+    ops = {row["name"]: op for table, op, row in events_since(seq)}
+    assert ops == {"Upsert Old": "update", "Upsert New": "insert"}
+
+
+def test_deleting_team_publishes_its_heroes(client):
+    team = client.post("/teams/", json={"name": "Doomed", "headquaters": "X"}).json()
+    hero = client.post(
+        "/heroes/",
+        json={"name": "Orphan", "secret_name": "Orphan", "team_id": team["id"]},
+    ).json()
+    seq = change_feed.seq
+
+    assert client.delete(f"/teams/{team['id']}").status_code == 204
+
+    events = events_since(seq)
+    assert ("teams", "delete") in [(table, op) for table, op, _ in events]
+    heroes = [row for table, op, row in events if table == "heroes" and op == "update"]
+    assert [(row["id"], row["team_id"]) for row in heroes] == [(hero["id"], None)]
+    response = client.get(f"/heroes/{hero['id']}/teams", params={"show_team": True})
+    assert response.json()["team"] is None
@@ -0,0 +1,64 @@
+"""Coalesced writes share a commit, but every caller keeps its own outcome."""
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from database.coalescer import WriteCoalescer, insert_op
+from models.city import City, CityCreate
+
+
+def city(name: str) -> CityCreate:
+    return CityCreate(name=name, capital_city=f"{name} capital")
+
+
+async def write_all(coalescer: WriteCoalescer, ops: list) -> list:
+    return await asyncio.gather(
+        *[coalescer.submit(op) for op in ops], return_exceptions=True
+    )
+
+
+def test_bad_row_fails_only_its_own_caller(client):
+    client.post("/cities/", json={"name": "Taken", "capital_city": "Taken"})
+    coalescer = WriteCoalescer(window=0.05, max_batch=10)
+    ops = [
+        insert_op(City, city("Fine A")),
+        insert_op(City, CityCreate(name="Taken", capital_city="Other")),
+        insert_op(City, city("Fine B")),
+    ]
+
+    results = client.portal.call(write_all, coalescer, ops)
+
+    assert isinstance(results[1], IntegrityError)
+    assert [results[0].name, results[2].name] == ["Fine A", "Fine B"]
+    assert coalescer.batches == 1
+    # The rejected batch was retried write by write.
+    assert coalescer.isolated == 3
+    assert client.get("/cities/", params={"query": "Fine B"}).status_code == 200
+
+
+def test_failing_op_does_not_roll_back_the_batch(client):
+    async def refuse(session):
+        raise ValueError("refused")
+
+    coalescer = WriteCoalescer(window=0.05, max_batch=10)
+    ops = [insert_op(City, city("Kept A")), refuse, insert_op(City, city("Kept B"))]
+
+    results = client.portal.call(write_all, coalescer, ops)
+
+    assert isinstance(results[1], ValueError)
+    assert [results[0].name, results[2].name] == ["Kept A", "Kept B"]
+    assert coalescer.isolated == 0
+
+
+def test_full_batch_is_written_without_waiting(client):
+    coalescer = WriteCoalescer(window=60, max_batch=2)
+    ops = [insert_op(City, city("Eager A")), insert_op(City, city("Eager B"))]
+
+    async def write_quickly():
+        return await asyncio.wait_for(write_all(coalescer, ops), timeout=5)
+
+    results = client.portal.call(write_quickly)
+
+    assert [row.name for row in results] == ["Eager A", "Eager B"]
+    assert coalescer.batches == 1
@@ -0,0 +1,67 @@
+"""ETags and Last-Modified follow the table versions, so 304s are never stale."""
+import time
+
+
+def test_if_modified_since_sees_write_in_same_second(client):
+    client.post("/cities/", json={"name": "Lima", "capital_city": "Lima"})
+    # No Last-Modified is sent until the second of the write has passed.
+    time.sleep(1)
+    last_modified = client.get("/cities/").headers["last-modified"]
+    headers = {"if-modified-since": last_modified}
+    assert client.get("/cities/", headers=headers).status_code == 304
+
+    client.post("/cities/", json={"name": "Quito", "capital_city": "Quito"})
+    response = client.get("/cities/", headers=headers)
+    assert response.status_code == 200
+    assert "Quito" in response.text
+    assert response.headers.get("last-modified") != last_modified
+
+
+def test_etag_moves_with_local_writes(client):
+    path = "/cities/" + str(
+        client.post("/cities/", json={"name": "Riga", "capital_city": "Riga"}).json()[
+            "id"
+        ]
+    )
+    etag = client.get(path).headers["etag"]
+    assert client.get(path, headers={"if-none-match": etag}).status_code == 304
+
+    client.patch(path + "/name", json={"name": "Riga Old Town"})
+    response = client.get(path, headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Riga Old Town"
+    assert response.headers["etag"] != etag
+
+
+def test_other_worker_write_invalidates_after_poll(client, other_worker, poll):
+    city = client.post("/cities/", json={"name": "Tartu", "capital_city": "Tartu"})
+    path = f"/cities/{city.json()['id']}"
+    etag = client.get(path).headers["etag"]
+
+    other_worker(
+        "cities",
+        "UPDATE cities SET name = 'Dorpat' WHERE id = :id",
+        id=city.json()["id"],
+    )
+    # Until the poller runs this worker does not know about the write.
+    assert client.get(path, headers={"if-none-match": etag}).status_code == 304
+    poll()
+
+    response = client.get(path, headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Dorpat"
+    assert client.get(path).json()["name"] == "Dorpat"
+
+
+def test_team_etag_covers_its_heroes(client):
+    team = client.post("/teams/", json={"name": "Etag Team", "headquaters": "Y"})
+    path = f"/teams/{team.json()['id']}/heroes"
+    etag = client.get(path).headers["etag"]
+
+    client.post(
+        "/heroes/",
+        json={"name": "Etag Hero", "secret_name": "E", "team_id": team.json()["id"]},
+    )
+    response = client.get(path, headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert [hero["name"] for hero in response.json()["heroes"]] == ["Etag Hero"]
@@ -0,0 +1,40 @@
+"""List routes answer with the one response model they declare."""
+
+
+def test_name_lookup_returns_a_page(client):
+    client.post("/teams/", json={"name": "Lookup", "headquaters": "Here"})
+    response = client.get("/teams/", params={"query": "Lookup"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [team["name"] for team in body["items"]] == ["Lookup"]
+    assert body["next_cursor"] is None
+
+    response = client.get("/teams/", params={"query": "Nowhere"})
+    assert response.status_code == 404
+
+
+def test_batch_keeps_request_order_and_marks_missing(client):
+    ids = [
+        client.post("/cities/", json={"name": name, "capital_city": name}).json()["id"]
+        for name in ("Batch A", "Batch B")
+    ]
+    response = client.get("/cities/batch", params={"ids": f"{ids[1]},999999,{ids[0]}"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item and item["name"] for item in body["items"]] == [
+        "Batch B",
+        None,
+        "Batch A",
+    ]
+    assert body["missing"] == [999999]
+    assert client.get("/cities/batch").status_code == 422
+
+
+def test_list_routes_declare_one_model(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    for resource in ("cities", "heroes", "teams"):
+        for path in (f"/{resource}/", f"/{resource}/batch"):
+            schema = paths[path]["get"]["responses"]["200"]["content"][
+                "application/json"
+            ]["schema"]
+            assert "$ref" in schema, (path, schema)
@@ -0,0 +1,25 @@
+"""Requests are labelled by route template, also when answered before routing."""
+from middleware.metrics import REQUEST_LATENCY
+
+
+def requests_of(route: str, status: str) -> int:
+    # Histogram state is [bucket counts, sum, count].
+    return sum(
+        state[2]
+        for (method, label, code), state in REQUEST_LATENCY.values.items()
+        if label == route and code == status
+    )
+
+
+def test_not_modified_is_labelled_with_route(client):
+    city = client.post("/cities/", json={"name": "Oslo", "capital_city": "Oslo"})
+    path = f"/cities/{city.json()['id']}"
+    etag = client.get(path).headers["etag"]
+    before = requests_of("/cities/{city_id}", "304")
+
+    for _ in range(3):
+        response = client.get(path, headers={"if-none-match": etag})
+        assert response.status_code == 304
+
+    assert requests_of("/cities/{city_id}", "304") == before + 3
+    assert requests_of("unmatched", "304") == 0
@@ -0,0 +1,83 @@
+"""Related rows are loaded with a fixed number of queries, not one per row.
+
+Runs the app against a throwaway SQLite database, counts the statements
+each request sends and checks the count stays the same as the tables grow.
+"""
+import pytest
+from sqlalchemy import event, text
+
+HEROES_PER_TEAM = 3
+
+
+@pytest.fixture
+def statements(client):
+    from database.db import get_async_engine, get_engine
+
+    engine = get_async_engine()
+    engine = engine.sync_engine if engine is not None else get_engine()
+    executed = []
+
+    def record(connection, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def add_teams(count: int) -> None:
+    """Add ``count`` teams with HEROES_PER_TEAM heroes each."""
+    from database.db import get_engine
+
+    with get_engine().begin() as connection:
+        first = connection.execute(text("SELECT max(id) FROM teams")).scalar() or 0
+        first += 1
+        connection.execute(
+            text("INSERT INTO teams (name, headquaters) VALUES (:name, :hq)"),
+            [
+                {"name": f"Team {i}", "hq": f"HQ {i}"}
+                for i in range(first, first + count)
+            ],
+        )
+        heroes = [
+            (f"{team}-{n}", team)
+            for team in range(first, first + count)
+            for n in range(HEROES_PER_TEAM)
+        ]
+        # Team 1 keeps growing too, for its heroes endpoint.
+        heroes.append((f"{first}-extra", 1))
+        connection.execute(
+            text(
+                "INSERT INTO heroes (name, secret_name, age, team_id) "
+                "VALUES (:name, :secret, 30, :team)"
+            ),
+            [
+                {"name": f"Hero {key}", "secret": f"Secret {key}", "team": team}
+                for key, team in heroes
+            ],
+        )
+
+
+def count_statements(client, statements, path: str) -> tuple[int, dict]:
+    statements.clear()
+    response = client.get(path)
+    assert response.status_code == 200, response.text
+    return len(statements), response.json()
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/heroes/?include=team&limit=500",
+        "/teams/?include=heroes&limit=500",
+        "/teams/1/heroes",
+    ],
+)
+def test_queries_do_not_grow_with_rows(client, statements, path):
+    add_teams(2)
+    few, few_body = count_statements(client, statements, path)
+    add_teams(40)
+    many, many_body = count_statements(client, statements, path)
+
+    assert many_body != few_body
+    assert many == few, statements
@@ -0,0 +1,89 @@
+"""Concurrent callers of the same key share one call, whatever happens to it."""
+import asyncio
+
+import pytest
+
+from database.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*[flights.do("key", load) for _ in range(5)])
+        assert results == [1] * 5
+        assert (flights.leaders, flights.coalesced) == (1, 4)
+        assert flights.calls == {}
+
+    asyncio.run(scenario())
+
+
+def test_leader_error_reaches_followers():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise LookupError("gone")
+
+        results = await asyncio.gather(
+            *[flights.do("key", fail) for _ in range(3)], return_exceptions=True
+        )
+        assert all(isinstance(result, LookupError) for result in results)
+        assert flights.leaders == 1
+
+    asyncio.run(scenario())
+
+
+def test_follower_takes_over_from_cancelled_leader():
+    async def scenario():
+        flights = SingleFlight("test")
+        started = []
+
+        async def load():
+            started.append(len(started))
+            await asyncio.sleep(0.05)
+            return len(started)
+
+        leader = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flights.do("key", load)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # One follower ran the call again, the others waited on it.
+        assert await asyncio.gather(*followers) == [2, 2, 2]
+        assert flights.leaders == 2
+        assert flights.calls == {}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_follower_leaves_the_call_running():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def load():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        leader = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0.005)
+        follower.cancel()
+
+        assert await leader == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+
+    asyncio.run(scenario())